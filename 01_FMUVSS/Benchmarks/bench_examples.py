@@ -0,0 +1,288 @@
+"""
+Throughput of the FMUVSS engines on the example models and on mock FMUs.
+
+Each case runs the framework engine (FMUVSS_FMI2.0.py / FMUVSS_FMI3.0.py) with the config of an
+example script, or with a mock-FMU config, in a fresh process, and reports:
+  steps/s          output samples per second of wall time in run() (median over --repeat runs)
+  switch latency   time from loading a mode's FMU until its initialization has finished
+  peak RSS         maximum resident memory of the process, and its growth during the runs
+  overhead         fraction of run() spent outside do_step/doStep, from one extra timed run
+
+Examples without FMUs for an FMI version (Satellite and Clutch have FMI 2.0 only) are skipped.
+
+Usage: python bench_examples.py [--cases NAME ...] [--fmi 2.0 3.0] [--horizon short|full]
+                                [--repeat N] [--json out.json]
+"""
+import argparse
+import copy
+import importlib.util
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent))
+from FMUVSS_Sweep import load_engine
+
+EXAMPLES = HERE.parent / 'Examples'
+
+# Example -> (script per FMI version, shortened stop time); stop times cover at least one switch
+EXAMPLE_CASES = {
+    'BouncingBall': ({'2.0': 'FMUVSS_FMI2.0_BouncingBall.py', '3.0': 'FMUVSS_FMI3.0_BouncingBall.py'}, 1.0),
+    'Pendulum': ({'2.0': 'FMUVSS_FMI2.0_Pendulum.py', '3.0': 'FMUVSS_FMI3.0_Pendulum.py'}, 1.0),
+    'Satellite': ({'2.0': 'FMUVSS_FMI2.0_Satellite.py'}, 600.0),
+    'Clutch': ({'2.0': 'FMUVSS_FMI2.0_Clutch.py'}, 6.0),
+}
+
+def _mock_pendulum(extra=0):
+    outputs = ['x', 'y', 'dx', 'dy', 'F'] + [f'e{i}' for i in range(extra)]
+    return {
+        'simulation': {'initial_time': 0.0, 'global_stop_time': 10.0, 'step_size': 1e-4, 'initial_mode': 'Pendulum'},
+        'modes': {
+            'Pendulum': {'fmu_path': f'mock:pendulum?phi=1.2&vars={extra}', 'outputs': outputs,
+                         'stop_condition': 'dphi > 2.5', 'next_mode': 'Freeflying',
+                         'transition_mapping': {'Freeflying': {'x': 'x', 'y': 'h', 'dx': 'vx', 'dy': 'vy'}}},
+            'Freeflying': {'fmu_path': 'mock:ball', 'outputs': ['x', 'h', 'vx', 'vy'],
+                           'stop_condition': 'h < -1e9'},
+        },
+    }
+
+def _mock_switching():
+    # Only y is handed over; without a mapping the FMI 2.0 engine would also hand over the slope
+    return {
+        'simulation': {'initial_time': 0.0, 'global_stop_time': 20.0, 'step_size': 1e-4, 'initial_mode': 'Up'},
+        'modes': {
+            'Up': {'fmu_path': 'mock:ramp?slope=1', 'outputs': ['y'], 'stop_condition': 'y >= 1',
+                   'next_mode': 'Down', 'transition_mapping': {'Down': {'y': 'y'}}},
+            'Down': {'fmu_path': 'mock:ramp?slope=-1', 'outputs': ['y'], 'stop_condition': 'y <= 0',
+                     'next_mode': 'Up', 'transition_mapping': {'Up': {'y': 'y'}}},
+        },
+    }
+
+# Mock case -> (config factory, shortened stop time)
+MOCK_CASES = {
+    'mock-Pendulum': (_mock_pendulum, 2.0),
+    'mock-Wide': (lambda: _mock_pendulum(extra=200), 0.5),
+    'mock-Switching': (_mock_switching, 5.0),
+}
+
+def _load_example_config(example, fmi_version):
+    """The `config` of an example script, with FMU paths made absolute"""
+    scripts, _ = EXAMPLE_CASES[example]
+    path = EXAMPLES / example / scripts[fmi_version]
+    spec = importlib.util.spec_from_file_location(f'_bench_{example}_{fmi_version.replace(".", "_")}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    config = copy.deepcopy(module.config)
+    for mode in config['modes'].values():
+        mode['fmu_path'] = str((path.parent / mode['fmu_path']).resolve())
+    return config
+
+def case_config(name, fmi_version, horizon):
+    if name in MOCK_CASES:
+        factory, short = MOCK_CASES[name]
+        config = factory()
+    else:
+        _, short = EXAMPLE_CASES[name]
+        config = _load_example_config(name, fmi_version)
+    if horizon == 'short':
+        config['simulation']['global_stop_time'] = min(short, config['simulation']['global_stop_time'])
+    return config
+
+class _Probe:
+    """Collects switch latencies and, if enabled, the time spent inside the FMU step call"""
+
+    def __init__(self, time_steps=False):
+        self.time_steps = time_steps
+        self.latencies = []
+        self.step_time = 0.0
+
+    def wrap(self, fmu, loaded):
+        return _TimedFMU(fmu, loaded, self)
+
+class _TimedFMU:
+    """
+    Forwards every attribute to the wrapped FMU. Forwarded attributes are cached on the proxy,
+    so after the first access a call costs the same as on the FMU itself.
+    """
+
+    def __init__(self, fmu, loaded, probe):
+        self._fmu = fmu
+        init_name = 'initialize' if hasattr(fmu, 'initialize') else 'exitInitializationMode'
+        init = getattr(fmu, init_name)
+
+        def initialized(*args, **kwargs):
+            result = init(*args, **kwargs)
+            probe.latencies.append(time.perf_counter() - loaded)
+            return result
+        setattr(self, init_name, initialized)
+
+        if probe.time_steps:
+            step_name = 'do_step' if hasattr(fmu, 'do_step') else 'doStep'
+            step = getattr(fmu, step_name)
+
+            def timed_step(*args, **kwargs):
+                start = time.perf_counter()
+                result = step(*args, **kwargs)
+                probe.step_time += time.perf_counter() - start
+                return result
+            setattr(self, step_name, timed_step)
+
+    def __getattr__(self, name):
+        value = getattr(self._fmu, name)
+        setattr(self, name, value)
+        return value
+
+def _instrument(simulator, probe, fmi_version):
+    """Routes FMU creation of one simulator through the probe; returns a function that undoes it"""
+    if fmi_version == '2.0':
+        module = sys.modules[type(simulator).__module__]
+        originals = {name: getattr(module, name) for name in ('load_fmu', 'MockFMU2')}
+        for name, original in originals.items():
+            def loader(path, _original=original):
+                loaded = time.perf_counter()
+                return probe.wrap(_original(path), loaded)
+            setattr(module, name, loader)
+        return lambda: [setattr(module, name, original) for name, original in originals.items()]
+
+    setup = simulator.setup_fmu
+
+    def setup_fmu(fmu_path, name):
+        loaded = time.perf_counter()
+        fmu, unzip, md = setup(fmu_path, name)
+        return probe.wrap(fmu, loaded), unzip, md
+    simulator.setup_fmu = setup_fmu
+    return lambda: None
+
+def _rss_mb():
+    """Current resident set size in MB, None where /proc is not available"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+def _simulate(engine, config, fmi_version, probe):
+    simulator = engine(copy.deepcopy(config), verbose=False)
+    restore = _instrument(simulator, probe, fmi_version)
+    try:
+        start = time.perf_counter()
+        simulator.run()
+        wall = time.perf_counter() - start
+    finally:
+        restore()
+    steps = sum(len(result['time']) for result in simulator.results)
+    return wall, steps, len(simulator.results)
+
+def run_case(name, fmi_version, horizon, repeat):
+    """Runs one case (in a worker process) and returns its result row"""
+    row = {'case': name, 'fmi_version': fmi_version, 'variant': 'mock' if name in MOCK_CASES else 'fmu',
+           'horizon': horizon}
+    try:
+        engine = load_engine(fmi_version)
+        config = case_config(name, fmi_version, horizon)
+    except Exception as e:
+        row['skipped'] = f"{type(e).__name__}: {e}"
+        return row
+    row['stop_time'] = config['simulation']['global_stop_time']
+    row['step_size'] = config['simulation']['step_size']
+
+    rss_before = _rss_mb()
+    walls, latencies = [], []
+    try:
+        for _ in range(repeat):
+            probe = _Probe()
+            wall, steps, segments = _simulate(engine, config, fmi_version, probe)
+            walls.append(wall)
+            latencies.extend(probe.latencies)
+        probe = _Probe(time_steps=True)
+        timed_wall, _, _ = _simulate(engine, config, fmi_version, probe)
+    except Exception as e:
+        row['error'] = f"{type(e).__name__}: {e}"
+        return row
+
+    wall = statistics.median(walls)
+    rss_after = _rss_mb()
+    row.update({
+        'steps': steps,
+        'segments': segments,
+        'wall_s': walls,
+        'steps_per_s': steps / wall if wall > 0 else None,
+        'switch_latency_ms': statistics.median(latencies) * 1e3 if latencies else None,
+        'switch_latency_max_ms': max(latencies) * 1e3 if latencies else None,
+        'peak_rss_mb': _peak_rss_mb(),
+        'rss_growth_mb': rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        'overhead_fraction': 1 - probe.step_time / timed_wall if timed_wall > 0 else None,
+    })
+    return row
+
+def _machine():
+    return {'python': platform.python_version(), 'machine': platform.machine(),
+            'processor': platform.processor(), 'system': platform.platform(), 'cpus': os.cpu_count()}
+
+def collect(cases, fmi_versions, horizon, repeat):
+    """Runs every case in its own fresh process, one at a time, so memory peaks and timings do not mix"""
+    context = multiprocessing.get_context('spawn')
+    rows = []
+    for name in cases:
+        for fmi_version in fmi_versions:
+            if name in EXAMPLE_CASES and fmi_version not in EXAMPLE_CASES[name][0]:
+                continue
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                rows.append(pool.submit(run_case, name, fmi_version, horizon, repeat).result())
+    check_workloads(rows)
+    return rows
+
+def check_workloads(rows):
+    """Raises if a mock case ran a different number of segments under the two FMI versions"""
+    segments = {}
+    for row in rows:
+        if row['variant'] == 'mock' and 'segments' in row:
+            segments.setdefault(row['case'], {})[row['fmi_version']] = row['segments']
+    for name, per_version in segments.items():
+        if len(set(per_version.values())) > 1:
+            raise RuntimeError(f"{name} ran a different workload per FMI version (segments: {per_version})")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cases', nargs='+', default=list(EXAMPLE_CASES) + list(MOCK_CASES),
+                        choices=list(EXAMPLE_CASES) + list(MOCK_CASES))
+    parser.add_argument('--fmi', nargs='+', default=['2.0', '3.0'], choices=['2.0', '3.0'])
+    parser.add_argument('--horizon', choices=['short', 'full'], default='short',
+                        help="Stop early ('short', default) or use the example's global_stop_time")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help="Write the results to this file")
+    args = parser.parse_args(argv)
+
+    rows = collect(args.cases, args.fmi, args.horizon, args.repeat)
+    print(f"{'case':<16}{'FMI':>5}{'steps':>10}{'steps/s':>12}{'switch [ms]':>13}{'peak RSS [MB]':>15}{'overhead':>10}")
+    for row in rows:
+        if 'steps' not in row:
+            print(f"{row['case']:<16}{row['fmi_version']:>5}  {row.get('skipped') or row.get('error')}")
+            continue
+        latency = f"{row['switch_latency_ms']:.2f}" if row['switch_latency_ms'] is not None else '-'
+        peak = f"{row['peak_rss_mb']:.0f}" if row['peak_rss_mb'] is not None else '-'
+        print(f"{row['case']:<16}{row['fmi_version']:>5}{row['steps']:>10}{row['steps_per_s']:>12.0f}"
+              f"{latency:>13}{peak:>15}{row['overhead_fraction']:>10.1%}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'machine': _machine(), 'horizon': args.horizon, 'repeat': args.repeat, 'results': rows},
+                      f, indent=2)
+
+if __name__ == '__main__':
+    main()
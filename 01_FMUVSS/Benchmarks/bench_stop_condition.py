@@ -0,0 +1,82 @@
+"""
+Per-step cost of evaluating a stop condition against FMUs with a growing number of parameters.
+
+'copy' is the former loop body (dict(mode_params) plus the monitored vars, every step);
+'view' is the StopConditionView used by FMUVSS_FMI2.0.py, with parameters bound once at mode entry.
+
+Usage: python bench_stop_condition.py [--steps N] [--json out.json]
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from VSSRuntime.expressions import as_condition
+from VSSRuntime.views import StopConditionView
+
+PARAM_COUNTS = [0, 10, 100, 1000, 10000]
+CONDITIONS = {
+    'lambda': (lambda vars: vars['r'] > vars['L'], ['r']),
+    'expression': ('r > L', ['r']),
+}
+
+def _params(n):
+    params = {f'p{i}': float(i) for i in range(n)}
+    params['L'] = 2.0
+    return params
+
+def bench_copy(condition, params, monitored, steps):
+    values = [1.0] * len(monitored)
+    start = time.perf_counter()
+    for _ in range(steps):
+        current_vars = dict(params)
+        for var, val in zip(monitored, values):
+            current_vars[var] = val
+        condition(current_vars)
+    return (time.perf_counter() - start) / steps
+
+def bench_view(condition, params, monitored, steps):
+    values = [1.0] * len(monitored)
+    view = StopConditionView(condition, params, monitored)
+    start = time.perf_counter()
+    for _ in range(steps):
+        view.update(values)
+        view.check()
+    return (time.perf_counter() - start) / steps
+
+def collect(steps):
+    rows = []
+    for kind, (spec, monitored) in CONDITIONS.items():
+        condition = as_condition(spec)
+        for n in PARAM_COUNTS:
+            params = _params(n)
+            rows.append({
+                'condition': kind,
+                'parameters': n,
+                'copy_ns': bench_copy(condition, params, monitored, steps) * 1e9,
+                'view_ns': bench_view(condition, params, monitored, steps) * 1e9,
+            })
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--steps', type=int, default=20000)
+    parser.add_argument('--json', help="Write the results to this file")
+    args = parser.parse_args(argv)
+
+    rows = collect(args.steps)
+    print(f"{'condition':<12}{'parameters':>12}{'copy [ns/step]':>18}{'view [ns/step]':>18}")
+    for row in rows:
+        print(f"{row['condition']:<12}{row['parameters']:>12}{row['copy_ns']:>18.0f}{row['view_ns']:>18.0f}")
+
+    if args.json:
+        machine = {'python': platform.python_version(), 'machine': platform.machine(),
+                   'processor': platform.processor(), 'system': platform.platform()}
+        with open(args.json, 'w') as f:
+            json.dump({'machine': machine, 'steps': args.steps, 'results': rows}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
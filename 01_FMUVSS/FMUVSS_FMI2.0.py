@@ -1,6 +1,16 @@
-from pyfmi import load_fmu # type: ignore
 import numpy as np
 import matplotlib.pyplot as plt
+from VSSRuntime.buffers import SegmentBuffer
+from VSSRuntime.expressions import Condition, Transition, as_condition, as_transition
+from VSSRuntime.memory import MemoryMonitor, result_bytes
+from VSSRuntime.mockfmu import MockFMU2, is_mock
+from VSSRuntime.modeldescription import read_model_variables
+from VSSRuntime.profiler import PROFILERS, SamplingProfiler
+from VSSRuntime.timers import (CONDITION, INITIALIZE, LOAD, LOG, READ, STEP, TRANSITION,
+                                PhaseTimers)
+from VSSRuntime.trace import TraceRecorder
+from VSSRuntime.transitions import BatchedAccess, compile_hand_overs
+from VSSRuntime.views import StopConditionView
 
 # === Configuration ===
 config = {
@@ -13,9 +23,8 @@ config = {
     'modes': {
         'Pendulum': {
             'fmu_path': './PendulumFMI2.0.fmu',
-            'monitored_vars': ['F'],
             'outputs': ['x', 'y', 'dx', 'dy', 'F'],
-            'stop_condition': lambda vars: vars['F'] < 0,
+            'stop_condition': 'F < 0',  # expression string or lambda vars: ...
             'transition_mapping': {
                 'Freeflying': {'x': 'x', 'y': 'y', 'dx': 'vx', 'dy': 'vy'},
             },
@@ -24,9 +33,8 @@ config = {
         'Freeflying': {
             'fmu_path': './FreeflyingFMI2.0.fmu',
             'initial_values': {'L': 2.001},  # optional
-            'monitored_vars': ['r', 'L'],
             'outputs': ['x', 'y', 'r'],
-            'stop_condition': lambda vars: vars['r'] > vars['L'],
+            'stop_condition': 'r > L',  # variables are read from the FMU, no monitored_vars needed
         }
     },
     'plot': {
@@ -40,126 +48,254 @@ config = {
 }
 
 # === Framework ===
+def load_fmu(fmu_path):
+    """Loads an FMU with PyFMI, imported on first use so that mock runs do not need it"""
+    try:
+        from pyfmi import load_fmu as pyfmi_load_fmu  # type: ignore
+    except ImportError as e:
+        raise ImportError("Loading FMI 2.0 FMUs requires PyFMI (pip install pyfmi)") from e
+    return pyfmi_load_fmu(fmu_path)
+
 class FMUVSS:
-    def __init__(self, config):
+    def __init__(self, config, verbose=True, timers=False, trace=None, profile=None,
+                 profile_path='profile.folded', memory=False, sink=None):
         self.sim_config = config['simulation']
         self.modes = config['modes']
-        self.plot_config = config['plot']
+        self.plot_config = config.get('plot', {})
+        self.verbose = verbose
         self.step_size = self.sim_config.get('step_size')
         self.global_stop_time = self.sim_config.get('global_stop_time')
         self.current_time = self.sim_config.get('initial_time')
         self.current_mode_key = self.sim_config.get('initial_mode')
         self.results = []  # Each entry is a dictionary for a simulation mode instance.
+        # Opt-in wall time and call counts per mode and loop phase; None keeps the loop untimed.
+        self.timers = PhaseTimers() if timers else None
+        # Opt-in Chrome trace of mode segments and FMU calls, written to the path `trace` after run().
+        self.trace_path = trace
+        self.trace = TraceRecorder('FMUVSS FMI 2.0') if trace else None
+        # profile='sampling' samples the stack per mode and writes folded stacks to profile_path after run().
+        if profile is not None and profile not in PROFILERS:
+            raise ValueError(f"Unknown profile '{profile}', expected one of {list(PROFILERS)}")
+        self.profile_path = profile_path
+        self.profiler = SamplingProfiler() if profile == 'sampling' else None
+        # memory=True samples memory at mode switches; a MemoryMonitor can also enforce a budget.
+        self.memory = MemoryMonitor() if memory is True else (memory or None)
+        # Optional result sink (e.g. VSSRuntime.hdf5.HDF5Sink) the segments are streamed to in chunks.
+        self.sink = sink
+        # Expression strings are compiled once; lambdas are kept as they are.
+        self.conditions = {name: as_condition(m['stop_condition']) for name, m in self.modes.items()}
+        self.transitions = {name: as_transition(m.get('next_mode')) for name, m in self.modes.items()}
+        # Model descriptions are read from the FMU archives; hand-overs naming unknown variables fail here.
+        self.variables = {name: read_model_variables(m['fmu_path']) for name, m in self.modes.items()}
+        self.hand_overs = compile_hand_overs(self.modes, self.transitions, self.variables)
+        self.decision_reads = {name: self._decision_reads(name) for name in self.modes}
+
+    def _info(self, msg):
+        if self.verbose:
+            print(msg)
 
-    def _get_parameters(self, fmu):
-        """Returns a dictionary of parameter values from the FMU."""
-        params = {}
-        model_vars = fmu.get_model_variables()
-        for name, var in model_vars.items():
-            if var.causality == 'parameter':
-                val = fmu.get(name)
-                params[name] = val[0] if isinstance(val, np.ndarray) else val
-        return params
+    def _get_parameters(self, fmu, names=None):
+        """Returns a dictionary of parameter values from the FMU (only `names` if given), read in one batch."""
+        variables = self.variables[self.current_mode_key]
+        params = [v for v in variables.values() if v.causality == 'parameter' and (names is None or v.name in names)]
+        access = BatchedAccess(params)
+        return dict(zip(access.names, access.read(fmu)))
+
+    def _decision_reads(self, mode):
+        """Variables the next_mode of a mode is evaluated on: those of a declarative transition, else outputs and parameters."""
+        transition = self.transitions[mode]
+        variables = self.variables[mode]
+        if isinstance(transition, Transition):
+            names = transition.variables
+        elif callable(transition):
+            names = list(self.modes[mode].get('outputs', [])) + [n for n, v in variables.items() if v.causality == 'parameter']
+        else:
+            return None
+        missing = [n for n in names if n not in variables]
+        if missing:
+            raise ValueError(f"Variables {missing} used by next_mode of '{mode}' do not exist in its FMU")
+        return BatchedAccess([variables[n] for n in dict.fromkeys(names)])
 
     def run(self):
         """Run the simulation based on the state machine until global stop time is reached."""
-        print(f"Starting simulation. Global stop time = {self.global_stop_time}s")
-        previous_final_vals = {}
+        if self.profiler is None:
+            return self._simulate()
+        with self.profiler:
+            self._simulate()
+        self.profiler.write(self.profile_path)
+        self._info(f"Profile written to {self.profile_path}")
+
+    def _simulate(self):
+        self._info(f"Starting simulation. Global stop time = {self.global_stop_time}s")
+        hand_over = None  # (HandOver, harvested values) from the previous mode
+        trace = self.trace
+        memory = self.memory
+        if memory:
+            memory.start()
+        if self.sink:
+            self.sink.set_metadata(engine='FMUVSS FMI 2.0', simulation=self.sim_config, modes=self.modes)
 
         while self.current_time < self.global_stop_time and self.current_mode_key is not None:
             mode_config = self.modes[self.current_mode_key]
-            print(f"Entering mode '{self.current_mode_key}' at t = {self.current_time:.2f}s")
-            fmu = load_fmu(mode_config['fmu_path'])
+            self._info(f"Entering mode '{self.current_mode_key}' at t = {self.current_time:.2f}s")
+            laps = self.timers.mode(self.current_mode_key) if self.timers else None
+            if self.profiler:
+                self.profiler.mode = self.current_mode_key
+            if laps:
+                laps.start()
+            if trace:
+                trace.begin_mode(self.current_mode_key, self.current_time)
+            fmu_path = mode_config['fmu_path']
+            fmu = MockFMU2(fmu_path) if is_mock(fmu_path) else load_fmu(fmu_path)
             fmu.setup_experiment(start_time=self.current_time)
-            
-            # Retrieve FMU parameters (if any)
-            mode_params = self._get_parameters(fmu)
+            if laps:
+                laps.lap(LOAD)
+            if trace:
+                trace.lap('load')
             
             # Set any initial values from config for this mode.
             for var, value in mode_config.get('initial_values', {}).items():
                 fmu.set(var, value)
             
-            # If coming from a previous mode, use the previously remapped outputs.
-            if previous_final_vals:
-                for var, value in previous_final_vals.items():
-                    fmu.set(var, value)
+            # If coming from a previous mode, write the handed-over values in one batch.
+            if hand_over is not None:
+                plan, values = hand_over
+                plan.apply(fmu, values)
             
             fmu.initialize()
 
-            mode_time = []
-            mode_data = {var: [] for var in mode_config.get('outputs', [])}
+            # Retrieve FMU parameters (if any) once, after initial and handed-over values are applied
+            condition = self.conditions[self.current_mode_key]
+            if isinstance(condition, Condition):
+                mode_params = self._get_parameters(fmu, condition.variables)
+                monitored = [var for var in condition.variables if var not in mode_params]
+            else:
+                mode_params = self._get_parameters(fmu)
+                monitored = mode_config.get('monitored_vars', [])
+
+            # Parameters are bound into the condition view here; each step only refreshes the monitored slots.
+            view = StopConditionView(condition, mode_params, monitored)
+
+            outputs = mode_config.get('outputs', [])
+            start_time = self.current_time
+            writer = self.sink.begin_segment(self.current_mode_key, outputs, start_time) if self.sink else None
+            buffer = SegmentBuffer(outputs, sink=writer)
             stop_met = False
+            over_budget = False
+            if laps:
+                laps.lap(INITIALIZE)
+            if trace:
+                trace.lap('initialize')
+            if memory:
+                memory.switch(self.current_mode_key, self.current_time, result_bytes(self.results), fmus=1)
+                over_budget = memory.check(self.results)
 
             # Run simulation for this mode until stop condition is met or until global time is reached.
-            while self.current_time < self.global_stop_time:
+            while not over_budget and self.current_time < self.global_stop_time:
                 current_step = min(self.step_size, self.global_stop_time - self.current_time)
                 fmu.do_step(current_t=self.current_time, step_size=current_step)
                 self.current_time += current_step
-                mode_time.append(self.current_time)
+                if laps:
+                    laps.lap(STEP)
 
                 # Collect outputs for this mode at *every* step
-                for var in mode_config.get('outputs', []):
+                vals = []
+                for var in outputs:
                     val = fmu.get(var)
-                    mode_data[var].append(val[0] if isinstance(val, np.ndarray) else val)
+                    vals.append(val[0] if isinstance(val, np.ndarray) else val)
+                if laps:
+                    laps.lap(READ)
+                buffer.append(self.current_time, vals)
+                if trace:
+                    trace.sample(outputs, vals)
+                if laps:
+                    laps.lap(LOG)
 
-                # Collect monitored vars to check stop condition
-                current_vars = dict(mode_params)
-                for var in mode_config.get('monitored_vars', []):
+                # Refresh monitored vars to check stop condition
+                vals = []
+                for var in monitored:
                     val = fmu.get(var)
-                    current_vars[var] = val[0] if isinstance(val, np.ndarray) else val
+                    vals.append(val[0] if isinstance(val, np.ndarray) else val)
+                if laps:
+                    laps.lap(READ)
+                view.update(vals)
+                met = view.check()
+                if laps:
+                    laps.lap(CONDITION)
 
-                if mode_config['stop_condition'](current_vars):
+                if met:
                     stop_met = True
-                    print(f"Mode '{self.current_mode_key}' stop condition met at t = {self.current_time:.3f}s")
+                    self._info(f"Mode '{self.current_mode_key}' stop condition met at t = {self.current_time:.3f}s")
                     break
+                if memory and memory.due() and memory.check(self.results):
+                    over_budget = True
+                    break
+            if trace:
+                trace.lap('steps', steps=len(buffer))
+
+            # Determine the next mode; a callable or declarative transition decides from the final values.
+            transition = self.transitions[self.current_mode_key]
+            decision = self.decision_reads[self.current_mode_key]
+            if over_budget:
+                next_mode = None  # The run stops after this segment
+            elif decision is not None:
+                next_mode = transition(dict(zip(decision.names, decision.read(fmu))))
+            else:
+                next_mode = transition
+
+            # Harvest only what the next mode consumes, before the FMU is terminated.
+            hand_over = None
+            if next_mode is not None:
+                plan = self.hand_overs.get((self.current_mode_key, next_mode))
+                if plan is None:
+                    raise ValueError(f"Transition from '{self.current_mode_key}' to unknown mode '{next_mode}'")
+                hand_over = (plan, plan.harvest(fmu))
 
-            # After finishing the mode, retrieve final outputs (and parameter values) for transition.
-            previous_final_vals = {}
-            for var in mode_config.get('outputs', []):
-                val = fmu.get(var)
-                previous_final_vals[var] = val[0] if isinstance(val, np.ndarray) else val
-            previous_final_vals.update(mode_params)
-            
             # Save the mode results.
+            buffer.finalize()
             self.results.append({
                 'mode': self.current_mode_key,
-                'time': mode_time,
-                'data': mode_data,
+                'time': buffer.time,
+                'data': buffer.as_dict(),
+                'start_time': start_time,
                 'stop_time': self.current_time,
-                'stop_reason': 'condition_met' if stop_met else 'global_stop'
+                'stop_reason': 'memory_budget' if over_budget else 'condition_met' if stop_met else 'global_stop'
             })
+            if self.sink:
+                self.sink.end_segment(self.results[-1])
+            if trace:
+                trace.lap('transition', next_mode=next_mode)
             fmu.terminate()
+            if laps:
+                laps.lap(TRANSITION)
+            if trace:
+                trace.lap('terminate')
+                trace.end_mode(self.current_time, stop_reason=self.results[-1]['stop_reason'])
 
-            # Determine the next mode.
-            next_mode = mode_config.get('next_mode')
-
-            # Apply the transition mapping from the leaving mode if defined.
-            if next_mode and 'transition_mapping' in mode_config:
-                mapping_dict = mode_config['transition_mapping'].get(next_mode)
-                if mapping_dict is not None:
-                    mapped_vals = {}
-                    # If the mapping_dict is empty, pass variables as is.
-                    if mapping_dict == {}:
-                        mapped_vals = previous_final_vals
-                    else:
-                        for curr_var, next_var in mapping_dict.items():
-                            if curr_var in previous_final_vals:
-                                mapped_vals[next_var] = previous_final_vals[curr_var]
-                            else:
-                                raise ValueError(f"Expected variable '{curr_var}' not found for transition from '{self.current_mode_key}' to '{next_mode}'")
-                    previous_final_vals = mapped_vals
-
-            # If next_mode is callable, invoke it to determine the next mode key.
-            if callable(next_mode):
-                self.current_mode_key = next_mode(previous_final_vals)
-            else:
-                self.current_mode_key = next_mode
+            if over_budget:
+                self._info(f"Memory budget of {memory.budget_mb} MB exceeded at t = {self.current_time:.3f}s. "
+                           "Stopping simulation.")
+                break
+
+            self.current_mode_key = next_mode
 
             if self.current_mode_key is None:
-                print("No next mode defined. Stopping simulation.")
+                self._info("No next mode defined. Stopping simulation.")
                 break
 
-        print(f"Simulation finished at t = {self.current_time:.3f}s")
+        self._info(f"Simulation finished at t = {self.current_time:.3f}s")
+        if self.timers:
+            self._info(self.timers.report())
+        if self.sink:
+            self.sink.flush()
+        if memory:
+            memory.switch(None, self.current_time, result_bytes(self.results))
+            memory.stop()
+            self._info(memory.report())
+        if trace:
+            trace.close(self.current_time)
+            trace.write(self.trace_path)
+            self._info(f"Trace written to {self.trace_path}")
 
     def plot(self):
         """Plot based on config."""
@@ -189,7 +325,7 @@ class FMUVSS:
             x_data = mode_result['time'] if x_var == 'time' else mode_result['data'].get(x_var)
             y_data = mode_result['data'].get(y_var)
 
-            if not x_data or not y_data or len(x_data) != len(y_data):
+            if x_data is None or y_data is None or len(x_data) == 0 or len(x_data) != len(y_data):
                 continue
 
             label = mode_name if mode_name not in legend_added else None
@@ -1,7 +1,13 @@
 import matplotlib.pyplot as plt
-from fmpy import read_model_description, extract
-from fmpy.fmi3 import FMU3Slave
 import shutil
+from VSSRuntime.buffers import SegmentBuffer
+from VSSRuntime.expressions import Condition, as_condition, as_transition
+from VSSRuntime.memory import MemoryMonitor, result_bytes
+from VSSRuntime.mockfmu import MockFMU3, is_mock, read_mock_description
+from VSSRuntime.profiler import PROFILERS, SamplingProfiler
+from VSSRuntime.timers import (CONDITION, INITIALIZE, LOAD, LOG, READ, STEP, TRANSITION,
+                                PhaseTimers)
+from VSSRuntime.trace import TraceRecorder
 
 # === Configuration ===
 config = {
@@ -14,17 +20,15 @@ config = {
     'modes': {
         'Pendulum': {
             'fmu_path': './PendulumFMI3.0.fmu',
-            'monitored_vars': ['F'],
             'outputs': ['x', 'y', 'dx', 'dy', 'F'],
-            'stop_condition': lambda vars: vars['F'] < 0,
+            'stop_condition': 'F < 0',  # expression string or lambda vars: ...
             'transition_mapping': {'Freeflying': {'x': 'x', 'y': 'y', 'dx': 'vx', 'dy': 'vy'}},
             'next_mode': 'Freeflying'
         },
         'Freeflying': {
             'fmu_path': './FreeflyingFMI3.0.fmu',
-            'monitored_vars': ['r', 'L'],
             'outputs': ['x', 'y', 'r'],
-            'stop_condition': lambda vars: vars['r'] > vars['L']
+            'stop_condition': 'r > L'  # variables are read from the FMU, no monitored_vars needed
         }
     },
     'plot': {
@@ -38,22 +42,57 @@ config = {
 }
 
 # === Framework ===
+def _fmpy():
+    """fmpy and fmpy.fmi3, imported on first use so that mock runs do not need them"""
+    try:
+        import fmpy  # type: ignore
+        import fmpy.fmi3  # type: ignore
+    except ImportError as e:
+        raise ImportError("Loading FMI 3.0 FMUs requires FMPy (pip install fmpy)") from e
+    return fmpy, fmpy.fmi3
+
 class FMUVSS:
-    def __init__(self, config):
+    def __init__(self, config, verbose=True, timers=False, trace=None, profile=None,
+                 profile_path='profile.folded', memory=False, sink=None):
         self.sim_cfg = config['simulation']
         self.modes = config['modes']
-        self.plot_config = config['plot']
+        self.plot_config = config.get('plot', {})
+        self.verbose = verbose
         self.step_size = self.sim_cfg['step_size']
         self.global_stop = self.sim_cfg['global_stop_time']
         self.current_time = self.sim_cfg['initial_time']
         self.current_mode = self.sim_cfg['initial_mode']
         self.results = []  # Each entry is a dictionary for a simulation mode instance.
+        # Opt-in wall time and call counts per mode and loop phase; None keeps the loop untimed.
+        self.timers = PhaseTimers() if timers else None
+        # Opt-in Chrome trace of mode segments and FMU calls, written to the path `trace` after run().
+        self.trace_path = trace
+        self.trace = TraceRecorder('FMUVSS FMI 3.0') if trace else None
+        # profile='sampling' samples the stack per mode and writes folded stacks to profile_path after run().
+        if profile is not None and profile not in PROFILERS:
+            raise ValueError(f"Unknown profile '{profile}', expected one of {list(PROFILERS)}")
+        self.profile_path = profile_path
+        self.profiler = SamplingProfiler() if profile == 'sampling' else None
+        # memory=True samples memory at mode switches; a MemoryMonitor can also enforce a budget.
+        self.memory = MemoryMonitor() if memory is True else (memory or None)
+        # Optional result sink (e.g. VSSRuntime.hdf5.HDF5Sink) the segments are streamed to in chunks.
+        self.sink = sink
+        # Expression strings are compiled once; lambdas are kept as they are.
+        self.conditions = {name: as_condition(m['stop_condition']) for name, m in self.modes.items()}
+        self.transitions = {name: as_transition(m.get('next_mode')) for name, m in self.modes.items()}
+
+    def _info(self, msg):
+        if self.verbose:
+            print(msg)
 
     def setup_fmu(self, fmu_path, name):
         """Initialize FMU instance and extract model description"""
-        md = read_model_description(fmu_path)
-        unzip = extract(fmu_path)
-        fmu = FMU3Slave(
+        if is_mock(fmu_path):
+            return MockFMU3(fmu_path, instanceName=name), None, read_mock_description(fmu_path)
+        fmpy, fmi3 = _fmpy()
+        md = fmpy.read_model_description(fmu_path)
+        unzip = fmpy.extract(fmu_path)
+        fmu = fmi3.FMU3Slave(
             guid=md.guid,
             unzipDirectory=unzip,
             modelIdentifier=md.coSimulation.modelIdentifier,
@@ -65,23 +104,56 @@ class FMUVSS:
         """Properly terminate and cleanup FMU instance"""
         fmu.terminate()
         fmu.freeInstance()
-        shutil.rmtree(unzip)
+        if unzip is not None:
+            shutil.rmtree(unzip)
 
     def run(self):
         """Main simulation loop with FMI3-specific updates"""
+        if self.profiler is None:
+            return self._simulate()
+        with self.profiler:
+            self._simulate()
+        self.profiler.write(self.profile_path)
+        self._info(f"Profile written to {self.profile_path}")
+
+    def _simulate(self):
         prev_vals = {}
+        trace = self.trace
+        memory = self.memory
+        if memory:
+            memory.start()
+        if self.sink:
+            self.sink.set_metadata(engine='FMUVSS FMI 3.0', simulation=self.sim_cfg, modes=self.modes)
         while self.current_time < self.global_stop and self.current_mode:
             mode_cfg = self.modes[self.current_mode]
-            print(f"Entering mode {self.current_mode} at t={self.current_time:.5f}")
+            self._info(f"Entering mode {self.current_mode} at t={self.current_time:.5f}")
+            laps = self.timers.mode(self.current_mode) if self.timers else None
+            if self.profiler:
+                self.profiler.mode = self.current_mode
+            if laps:
+                laps.start()
+            if trace:
+                trace.begin_mode(self.current_mode, self.current_time)
             fmu, unzip, md = self.setup_fmu(mode_cfg['fmu_path'], self.current_mode)
+            if laps:
+                laps.lap(LOAD)
+            if trace:
+                trace.lap('load')
             
             # FMI3 Instantiation with proper parameters
             fmu.instantiate()
+            if trace:
+                trace.lap('instantiate')
+
+            condition = self.conditions[self.current_mode]
+            transition = self.transitions[self.current_mode]
 
             # Create variable reference map with safety checks
             all_names = list(set(
                 mode_cfg.get('outputs', []) + 
                 mode_cfg.get('monitored_vars', []) +
+                list(getattr(condition, 'variables', ())) +
+                list(getattr(transition, 'variables', ())) +
                 list(mode_cfg.get('initial_values', {}).keys()) + 
                 list(prev_vals.keys())
             ))
@@ -107,9 +179,24 @@ class FMUVSS:
             fmu.exitInitializationMode()
 
             # Simulation loop with FMI3 step handling
-            mode_time, mode_data = [], {o: [] for o in mode_cfg.get('outputs', [])}
+            output_refs = [vr_map[o] for o in mode_cfg['outputs']]
+            if isinstance(condition, Condition):
+                # One batched read of exactly the variables the condition uses
+                check = condition.bind(condition.variables)
+                cond_refs = [vr_map[v] for v in condition.variables]
+            start_time = self.current_time
+            writer = self.sink.begin_segment(self.current_mode, mode_cfg['outputs'], start_time) if self.sink else None
+            buffer = SegmentBuffer(mode_cfg['outputs'], sink=writer)
             stop_met = False
-            while self.current_time < self.global_stop:
+            over_budget = False
+            if laps:
+                laps.lap(INITIALIZE)
+            if trace:
+                trace.lap('initialize')
+            if memory:
+                memory.switch(self.current_mode, self.current_time, result_bytes(self.results), fmus=1, dirs=[unzip])
+                over_budget = memory.check(self.results)
+            while not over_budget and self.current_time < self.global_stop:
                 h = min(self.step_size, self.global_stop - self.current_time)
                 fmu.doStep(
                     currentCommunicationPoint=self.current_time,
@@ -117,38 +204,97 @@ class FMUVSS:
                     noSetFMUStatePriorToCurrentPoint=False  # New FMI3 parameter
                 )
                 self.current_time += h
-                mode_time.append(self.current_time)
+                if laps:
+                    laps.lap(STEP)
 
                 # Read outputs
-                vals = fmu.getFloat64([vr_map[o] for o in mode_cfg['outputs']])
-                for i,o in enumerate(mode_cfg['outputs']):
-                    mode_data[o].append(vals[i])
+                vals = fmu.getFloat64(output_refs)
+                if laps:
+                    laps.lap(READ)
+                buffer.append(self.current_time, vals)
+                if trace:
+                    trace.sample(mode_cfg['outputs'], vals)
+                if laps:
+                    laps.lap(LOG)
 
                 # Check stop condition
-                mon = {v: fmu.getFloat64([vr_map[v]])[0] for v in mode_cfg['monitored_vars']}
-                if mode_cfg['stop_condition'](mon):
-                    print(f"Exit {self.current_mode} at t={self.current_time:.5f}")
+                if isinstance(condition, Condition):
+                    vals = fmu.getFloat64(cond_refs)
+                    if laps:
+                        laps.lap(READ)
+                    met = check(vals)
+                else:
+                    mon = {v: fmu.getFloat64([vr_map[v]])[0] for v in mode_cfg['monitored_vars']}
+                    if laps:
+                        laps.lap(READ)
+                    met = condition(mon)
+                if laps:
+                    laps.lap(CONDITION)
+                if met:
+                    self._info(f"Exit {self.current_mode} at t={self.current_time:.5f}")
                     stop_met = True
                     break
+                if memory and memory.due() and memory.check(self.results):
+                    over_budget = True
+                    break
+            if trace:
+                trace.lap('steps', steps=len(buffer))
 
             # Store results and prepare transition 
+            buffer.finalize()
+            mode_data = buffer.as_dict()
             self.results.append({
                 'mode': self.current_mode,
-                'time': mode_time,
+                'time': buffer.time,
                 'data': mode_data,
-                'stop_reason': 'condition' if stop_met else 'global'
+                'start_time': start_time,
+                'stop_time': self.current_time,
+                'stop_reason': 'memory_budget' if over_budget else 'condition' if stop_met else 'global'
             })
+            if self.sink:
+                self.sink.end_segment(self.results[-1])
 
             # Cleanup and mode transition
-            prev_vals = {o: mode_data[o][-1] for o in mode_cfg['outputs']}
-            if mode_cfg.get('transition_mapping') and mode_cfg.get('next_mode'):
-                mapping = mode_cfg['transition_mapping'].get(mode_cfg['next_mode'], {})
+            prev_vals = {o: mode_data[o][-1] for o in mode_cfg['outputs'] if len(mode_data[o])}
+            if over_budget:
+                next_mode = None  # The run stops after this segment
+            elif callable(transition):
+                extra = [v for v in getattr(transition, 'variables', ()) if v not in prev_vals]
+                if extra:
+                    prev_vals.update(zip(extra, fmu.getFloat64([vr_map[v] for v in extra])))
+                next_mode = transition(prev_vals)
+            else:
+                next_mode = transition
+            if mode_cfg.get('transition_mapping') and next_mode:
+                mapping = mode_cfg['transition_mapping'].get(next_mode, {})
                 prev_vals = {mapping.get(k,k): v for k,v in prev_vals.items()}
 
+            if trace:
+                trace.lap('transition', next_mode=next_mode)
             self.cleanup_fmu(fmu, unzip)
-            self.current_mode = mode_cfg.get('next_mode')
+            if laps:
+                laps.lap(TRANSITION)
+            if trace:
+                trace.lap('terminate')
+                trace.end_mode(self.current_time, stop_reason=self.results[-1]['stop_reason'])
+            if over_budget:
+                self._info(f"Memory budget of {memory.budget_mb} MB exceeded at t={self.current_time:.5f}, stopping")
+                break
+            self.current_mode = next_mode
 
-        print(f"Simulation finished at t={self.current_time:.5f}")
+        self._info(f"Simulation finished at t={self.current_time:.5f}")
+        if self.timers:
+            self._info(self.timers.report())
+        if self.sink:
+            self.sink.flush()
+        if memory:
+            memory.switch(None, self.current_time, result_bytes(self.results))
+            memory.stop()
+            self._info(memory.report())
+        if trace:
+            trace.close(self.current_time)
+            trace.write(self.trace_path)
+            self._info(f"Trace written to {self.trace_path}")
 
     def plot(self):
         """Plot based on config."""
@@ -178,7 +324,7 @@ class FMUVSS:
             x_data = mode_result['time'] if x_var == 'time' else mode_result['data'].get(x_var)
             y_data = mode_result['data'].get(y_var)
 
-            if not x_data or not y_data or len(x_data) != len(y_data):
+            if x_data is None or y_data is None or len(x_data) == 0 or len(x_data) != len(y_data):
                 continue
 
             label = mode_name if mode_name not in legend_added else None
@@ -0,0 +1,182 @@
+import copy
+import importlib.util
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+# === Design ===
+# A design is a list of variants; each variant maps a key to a value:
+#   'step_size', 'global_stop_time', 'initial_time'  -> config['simulation'][key]
+#   '<Mode>.<variable>'                              -> config['modes'][Mode]['initial_values'][variable]
+# FMU parameters and start values are both applied through 'initial_values' before initialization.
+
+def grid(axes):
+    """Full factorial design over {key: [values]}"""
+    keys = list(axes)
+    return [dict(zip(keys, values)) for values in itertools.product(*(axes[k] for k in keys))]
+
+def latin_hypercube(bounds, n, seed=None):
+    """Latin-hypercube design with n variants over {key: (low, high)}"""
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for key, (low, high) in bounds.items():
+        strata = (rng.permutation(n) + rng.random(n)) / n
+        columns[key] = low + strata * (high - low)
+    return [{key: float(columns[key][i]) for key in bounds} for i in range(n)]
+
+def random_design(bounds, n, seed=None):
+    """Uniform random design with n variants over {key: (low, high)}"""
+    rng = np.random.default_rng(seed)
+    columns = {key: rng.uniform(low, high, n) for key, (low, high) in bounds.items()}
+    return [{key: float(columns[key][i]) for key in bounds} for i in range(n)]
+
+def apply_variant(config, variant):
+    """Returns a deep copy of the config with the variant applied"""
+    config = copy.deepcopy(config)
+    for key, value in variant.items():
+        mode, sep, var = key.partition('.')
+        if not sep:
+            if key not in ('step_size', 'global_stop_time', 'initial_time'):
+                raise ValueError(f"Unknown simulation setting '{key}' in design")
+            config['simulation'][key] = value
+        elif mode in config['modes']:
+            config['modes'][mode].setdefault('initial_values', {})[var] = value
+        else:
+            raise ValueError(f"Unknown mode '{mode}' in design key '{key}'")
+    return config
+
+# === Engines ===
+ENGINE_SCRIPTS = {'2.0': 'FMUVSS_FMI2.0.py', '3.0': 'FMUVSS_FMI3.0.py'}
+
+def load_engine(fmi_version):
+    """Imports the FMUVSS class of the given FMI version from its framework script"""
+    here = Path(__file__).resolve().parent
+    if str(here) not in sys.path:
+        sys.path.insert(0, str(here))  # Makes VSSRuntime importable for the engine script
+    name = 'FMUVSS_FMI' + fmi_version.replace('.', '_')
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(name, here / ENGINE_SCRIPTS[fmi_version])
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[name]  # A failed import must not leave a half-initialized module behind
+            raise
+    return sys.modules[name].FMUVSS
+
+# === Workers ===
+_base_config = None
+
+def _init_worker(config):
+    global _base_config
+    _base_config = config
+
+def _run_variant(fmi_version, index, variant, keep_data):
+    record = {'index': index, 'variant': variant, 'error': None, 'segments': []}
+    engine = load_engine(fmi_version)
+    start = time.perf_counter()
+    try:
+        simulator = engine(apply_variant(_base_config, variant), verbose=False)
+        simulator.run()
+        record['segments'] = simulator.results
+    except Exception as e:
+        record['error'] = repr(e)
+    record['wall_time'] = time.perf_counter() - start
+
+    segments = record['segments']
+    record['modes'] = [seg['mode'] for seg in segments]
+    record['stop_reasons'] = [seg['stop_reason'] for seg in segments]
+    record['switch_times'] = [seg['stop_time'] for seg in segments[:-1]]
+    record['final_time'] = segments[-1]['stop_time'] if segments else None
+    if not keep_data:
+        record['segments'] = []
+    return record
+
+# === Results ===
+@dataclass
+class SweepResult:
+    """Stacked results of all runs; row i belongs to run run_index[i] and its segment number segment[i]"""
+    variants: List[dict]
+    runs: List[dict]  # Per-run metadata: modes, stop_reasons, switch_times, final_time, wall_time, error
+    columns: List[str] = field(default_factory=list)
+    run_index: np.ndarray = None
+    segment: np.ndarray = None
+    time: np.ndarray = None
+    data: Dict[str, np.ndarray] = field(default_factory=dict)  # NaN where a mode does not output the variable
+    offsets: np.ndarray = None  # Rows of run i are offsets[i]:offsets[i+1]
+
+    def run(self, i):
+        """Returns the time and data rows of run i as views"""
+        rows = slice(self.offsets[i], self.offsets[i + 1])
+        return {'time': self.time[rows], 'segment': self.segment[rows],
+                'data': {name: col[rows] for name, col in self.data.items()}}
+
+    def save(self, path):
+        """Writes the stacked arrays to a .npz file; variants, run metadata and columns go to its 'metadata' JSON entry"""
+        metadata = json.dumps({'variants': self.variants, 'runs': self.runs, 'columns': self.columns},
+                              default=lambda o: o.item() if hasattr(o, 'item') else repr(o))
+        np.savez(path, run_index=self.run_index, segment=self.segment, time=self.time,
+                 offsets=self.offsets, metadata=np.array(metadata), **{f'data/{k}': v for k, v in self.data.items()})
+
+    @classmethod
+    def load(cls, path):
+        """Reads a SweepResult written by save()"""
+        with np.load(path) as f:
+            metadata = json.loads(str(f['metadata']))
+            data = {key[len('data/'):]: f[key] for key in f.files if key.startswith('data/')}
+            return cls(variants=metadata['variants'], runs=metadata['runs'], columns=metadata['columns'],
+                       run_index=f['run_index'], segment=f['segment'], time=f['time'], data=data,
+                       offsets=f['offsets'])
+
+def _stack(records):
+    columns = sorted({name for rec in records for seg in rec['segments'] for name in seg['data']})
+    lengths = [sum(len(seg['time']) for seg in rec['segments']) for rec in records]
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+    total = int(offsets[-1])
+
+    run_index = np.empty(total, dtype=np.int32)
+    segment = np.empty(total, dtype=np.int32)
+    times = np.empty(total)
+    data = {name: np.full(total, np.nan) for name in columns}
+
+    for i, rec in enumerate(records):
+        row = offsets[i]
+        run_index[offsets[i]:offsets[i + 1]] = i
+        for j, seg in enumerate(rec['segments']):
+            n = len(seg['time'])
+            segment[row:row + n] = j
+            times[row:row + n] = seg['time']
+            for name, values in seg['data'].items():
+                data[name][row:row + n] = values
+            row += n
+    return columns, run_index, segment, times, data, offsets
+
+def sweep(config, design, fmi_version='2.0', workers=None, keep_data=True):
+    """
+    Runs every variant of the design headless in a worker process and returns a SweepResult.
+    The config reaches the workers through the pool initializer, so with the spawn start
+    method its stop conditions and transitions must be picklable.
+    """
+    records = [None] * len(design)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                             initializer=_init_worker, initargs=(config,)) as pool:
+        futures = [pool.submit(_run_variant, fmi_version, i, variant, keep_data)
+                   for i, variant in enumerate(design)]
+        for future in as_completed(futures):
+            record = future.result()
+            records[record['index']] = record
+
+    columns, run_index, segment, times, data, offsets = _stack(records)
+    runs = [{k: rec[k] for k in ('modes', 'stop_reasons', 'switch_times', 'final_time', 'wall_time', 'error')}
+            for rec in records]
+    return SweepResult(variants=list(design), runs=runs, columns=columns, run_index=run_index,
+                       segment=segment, time=times, data=data, offsets=offsets)
@@ -0,0 +1,2 @@
+"""VSSRuntime - Runtime support shared by the FMUVSS and ContextModelica engines"""
+__version__ = "0.0.1"
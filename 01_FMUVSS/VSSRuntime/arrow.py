@@ -0,0 +1,176 @@
+"""
+Apache Arrow and Parquet export of simulation results. Both engines' results become one table
+per run, with the segment index and the dictionary-encoded mode as leading columns:
+
+  FMUVSS           segment, mode, time, <output>...   outputs missing from a mode are null
+  ContextModelica  segment, mode, variable, time, value
+
+Record batches are built from the columnar result buffers without copying. Results that are backed
+by HDF5 datasets or memory-mapped spill files are read one chunk at a time.
+"""
+import json
+from typing import Dict, Iterator, Mapping, Optional, Sequence
+
+import numpy as np
+
+# Rows per record batch and Parquet row group, the same as the HDF5 sink's chunks
+CHUNK_ROWS = 8192
+
+def _pyarrow():
+    try:
+        import pyarrow  # type: ignore
+    except ImportError as e:
+        raise ImportError("Exporting results to Arrow requires pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+def _parquet():
+    _pyarrow()
+    import pyarrow.parquet  # type: ignore
+    return pyarrow.parquet
+
+def _column(pa, values, start: int, stop: int):
+    """Zero-copy float64 array of values[start:stop] for numpy arrays; other sources are read"""
+    block = values[start:stop]
+    if not isinstance(block, np.ndarray) or block.dtype != np.float64:
+        block = np.asarray(block, dtype=np.float64)
+    return pa.array(block)
+
+def _modes(pa, modes: Sequence[str]):
+    return pa.array(list(dict.fromkeys(modes)), type=pa.string())
+
+def _mode_column(pa, dictionary, code: int, n: int):
+    return pa.DictionaryArray.from_arrays(pa.array(np.full(n, code, dtype=np.int32)), dictionary)
+
+def results_schema(results: Sequence[dict], metadata: Optional[dict] = None):
+    """Schema of an FMUVSS run: the outputs of all modes in the order they first appear"""
+    pa = _pyarrow()
+    columns = dict.fromkeys(name for result in results for name in result['data'])
+    fields = [pa.field('segment', pa.int32(), nullable=False),
+              pa.field('mode', pa.dictionary(pa.int32(), pa.string()), nullable=False),
+              pa.field('time', pa.float64(), nullable=False)]
+    fields += [pa.field(name, pa.float64()) for name in columns]
+    metadata = {key: json.dumps(value, default=repr) for key, value in (metadata or {}).items()}
+    return pa.schema(fields, metadata=metadata or None)
+
+def record_batches(results: Sequence[dict], chunk_rows: int = CHUNK_ROWS, schema=None) -> Iterator:
+    """Yields one record batch per chunk of every FMUVSS segment"""
+    pa = _pyarrow()
+    schema = schema or results_schema(results)
+    columns = schema.names[3:]
+    dictionary = _modes(pa, [result['mode'] for result in results])
+    codes = {mode: i for i, mode in enumerate(dictionary.to_pylist())}
+    for index, result in enumerate(results):
+        n = len(result['time'])
+        data = result['data']
+        for start in range(0, n, chunk_rows):
+            stop = min(start + chunk_rows, n)
+            arrays = [pa.array(np.full(stop - start, index, dtype=np.int32)),
+                      _mode_column(pa, dictionary, codes[result['mode']], stop - start),
+                      _column(pa, result['time'], start, stop)]
+            arrays += [_column(pa, data[name], start, stop) if name in data else pa.nulls(stop - start, pa.float64())
+                       for name in columns]
+            yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def results_table(results: Sequence[dict], chunk_rows: int = CHUNK_ROWS, metadata: Optional[dict] = None):
+    """One Arrow table for the results of an FMUVSS run"""
+    pa = _pyarrow()
+    schema = results_schema(results, metadata)
+    return pa.Table.from_batches(list(record_batches(results, chunk_rows, schema)), schema=schema)
+
+def _log_chunks(entries, chunk_rows: int) -> Iterator[tuple]:
+    """(times, values) blocks of one ContextModelica log, a list of tuples or a sink's ChunkedLog"""
+    if isinstance(entries, list):
+        times = np.fromiter((t for t, _ in entries), dtype=float, count=len(entries))
+        values = np.fromiter((v for _, v in entries), dtype=float, count=len(entries))
+        for start in range(0, len(entries), chunk_rows):
+            yield times[start:start + chunk_rows], values[start:start + chunk_rows]
+        return
+    entries.flush()
+    times, values = entries.datasets
+    for start in range(0, len(entries), chunk_rows):
+        yield times[start:start + chunk_rows], values[start:start + chunk_rows]
+
+def logs_schema(metadata: Optional[dict] = None):
+    pa = _pyarrow()
+    fields = [pa.field('segment', pa.int32()),
+              pa.field('mode', pa.dictionary(pa.int32(), pa.string())),
+              pa.field('variable', pa.dictionary(pa.int32(), pa.string()), nullable=False),
+              pa.field('time', pa.float64(), nullable=False),
+              pa.field('value', pa.float64(), nullable=False)]
+    metadata = {key: json.dumps(value, default=repr) for key, value in (metadata or {}).items()}
+    return pa.schema(fields, metadata=metadata or None)
+
+def log_batches(logs: Mapping[str, list], chunk_rows: int = CHUNK_ROWS, schema=None) -> Iterator:
+    """
+    Yields record batches of ContextModelica logs in long format, one per chunk of every variable.
+    Entries are assigned to segments by the switch times in logs['mode']; entries logged before
+    the first switch have a null segment and mode.
+    """
+    pa = _pyarrow()
+    schema = schema or logs_schema()
+    switches = logs.get('mode', [])
+    switch_times = np.array([t for t, _ in switches], dtype=float)
+    modes = _modes(pa, [m for _, m in switches])
+    codes = {mode: i for i, mode in enumerate(modes.to_pylist())}
+    mode_codes = np.array([codes[m] for _, m in switches], dtype=np.int32)
+    names = [name for name in logs if name != 'mode']
+    variables = pa.array(names, type=pa.string())
+    for code, name in enumerate(names):
+        for times, values in _log_chunks(logs[name], chunk_rows):
+            segment = np.searchsorted(switch_times, times, side='right').astype(np.int32) - 1
+            before = segment < 0
+            mask = before if before.any() else None
+            if len(mode_codes):
+                mode_code = mode_codes[np.maximum(segment, 0)]
+            else:
+                mode_code = np.zeros(len(times), dtype=np.int32)
+            mode = pa.DictionaryArray.from_arrays(pa.array(mode_code, mask=mask), modes)
+            arrays = [pa.array(segment, mask=mask), mode, _mode_column(pa, variables, code, len(times)),
+                      _column(pa, times, 0, len(times)), _column(pa, values, 0, len(values))]
+            yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def logs_table(logs: Mapping[str, list], chunk_rows: int = CHUNK_ROWS, metadata: Optional[dict] = None):
+    """One Arrow table for the logs of a ContextModelica run"""
+    pa = _pyarrow()
+    schema = logs_schema(metadata)
+    return pa.Table.from_batches(list(log_batches(logs, chunk_rows, schema)), schema=schema)
+
+def write_parquet(batches: Iterator, schema, path, compression: str = 'zstd') -> int:
+    """
+    Writes record batches to a Parquet file, each batch as one row group, so row groups line up
+    with the chunks. Batches are written as they are produced. Returns the number of rows.
+    """
+    pq = _parquet()
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression=compression) as writer:
+        for batch in batches:
+            if batch.num_rows:
+                writer.write_batch(batch, row_group_size=batch.num_rows)
+                rows += batch.num_rows
+    return rows
+
+def results_to_parquet(results: Sequence[dict], path, chunk_rows: int = CHUNK_ROWS,
+                       metadata: Optional[dict] = None, compression: str = 'zstd') -> int:
+    schema = results_schema(results, metadata)
+    return write_parquet(record_batches(results, chunk_rows, schema), schema, path, compression)
+
+def logs_to_parquet(logs: Mapping[str, list], path, chunk_rows: int = CHUNK_ROWS,
+                    metadata: Optional[dict] = None, compression: str = 'zstd') -> int:
+    schema = logs_schema(metadata)
+    return write_parquet(log_batches(logs, chunk_rows, schema), schema, path, compression)
+
+def to_pandas(table):
+    """
+    DataFrame backed by the table's buffers. Float columns keep their Arrow chunks (pd.ArrowDtype),
+    so no float data is copied even across segments; dictionary columns become categoricals.
+    """
+    pa = _pyarrow()
+    try:
+        import pandas as pd  # type: ignore
+    except ImportError as e:
+        raise ImportError("Converting results to pandas requires pandas (pip install pandas)") from e
+    return table.to_pandas(types_mapper=lambda t: pd.ArrowDtype(t) if pa.types.is_floating(t) else None)
+
+def metadata(schema) -> Dict[str, object]:
+    """Decodes the run metadata stored in a schema by the functions above"""
+    return {key.decode(): json.loads(value) for key, value in (schema.metadata or {}).items()}
@@ -0,0 +1,73 @@
+import numpy as np
+from typing import Dict, Iterable, List
+
+class SegmentBuffer:
+    """
+    Growable columnar float64 storage for the results of one mode segment. With a `sink` (e.g.
+    an HDF5 SegmentWriter) the buffer holds one chunk: full chunks are written to the sink
+    instead of growing, and the columns are the sink's datasets once the segment is finalized.
+    """
+
+    def __init__(self, columns: Iterable[str], capacity: int = 4096, sink=None):
+        self.columns: List[str] = list(columns)
+        self._index = {name: i + 1 for i, name in enumerate(self.columns)}
+        self._sink = sink
+        if sink is not None:
+            capacity = sink.chunk_rows
+        self._data = np.empty((len(self.columns) + 1, max(capacity, 1)))  # Row 0 holds time
+        self._n = 0
+        self._written = 0  # Rows already handed to the sink
+
+    def __len__(self) -> int:
+        return self._written + self._n
+
+    def append(self, t: float, values):
+        """Appends one sample; values are ordered like `columns`"""
+        if self._n == self._data.shape[1]:
+            if self._sink is not None:
+                self._flush()
+            else:
+                self._grow()
+        self._data[0, self._n] = t
+        self._data[1:, self._n] = values
+        self._n += 1
+
+    def _grow(self):
+        grown = np.empty((self._data.shape[0], 2 * self._data.shape[1]))
+        grown[:, :self._n] = self._data[:, :self._n]
+        self._data = grown
+
+    def _flush(self):
+        self._sink.write(self._data[:, :self._n])
+        self._written += self._n
+        self._n = 0
+
+    def finalize(self):
+        """Releases unused capacity once the segment is complete, or writes the last chunk to the sink"""
+        if self._sink is not None:
+            if self._n:
+                self._flush()
+            self._data = self._data[:, :0]
+        elif self._n < self._data.shape[1]:
+            self._data = self._data[:, :self._n].copy()
+
+    @property
+    def time(self) -> np.ndarray:
+        if self._sink is not None:
+            return self._sink.time
+        return self._data[0, :self._n]
+
+    def column(self, name: str) -> np.ndarray:
+        if self._sink is not None:
+            return self._sink.as_dict()[name]
+        return self._data[self._index[name], :self._n]
+
+    def as_dict(self) -> Dict[str, np.ndarray]:
+        """Returns contiguous views of every column, keyed by variable name"""
+        if self._sink is not None:
+            return self._sink.as_dict()
+        return {name: self._data[i, :self._n] for name, i in self._index.items()}
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes
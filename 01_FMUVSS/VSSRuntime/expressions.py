@@ -0,0 +1,145 @@
+import ast
+import copy
+import math
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+# Functions callable from expressions; everything else is treated as a variable
+FUNCTIONS = {
+    'abs': abs, 'min': min, 'max': max,
+    'sqrt': math.sqrt, 'exp': math.exp, 'log': math.log,
+    'sin': math.sin, 'cos': math.cos, 'tan': math.tan, 'atan2': math.atan2,
+}
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+    ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+    ast.IfExp, ast.Call, ast.Constant, ast.Name, ast.Attribute, ast.Load,
+)
+
+def _dotted_name(node) -> Optional[str]:
+    """Returns 'a.b.c' for a Name/Attribute chain, None for anything else"""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return '.'.join(reversed(parts))
+
+class _VariableRewriter(ast.NodeTransformer):
+    """Replaces every variable with a subscript of the argument `_v`"""
+
+    def __init__(self, key: Callable[[str], ast.expr]):
+        self.key = key
+
+    def visit_Call(self, node):
+        if not (isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS) or node.keywords:
+            raise ValueError(f"Unsupported function call '{ast.unparse(node)}'")
+        node.args = [self.visit(arg) for arg in node.args]
+        return node
+
+    def visit_Attribute(self, node):
+        name = _dotted_name(node)
+        if name is None:
+            raise ValueError(f"Unsupported attribute access '{ast.unparse(node)}'")
+        return self._subscript(name, node)
+
+    def visit_Name(self, node):
+        return self._subscript(node.id, node)
+
+    def _subscript(self, name, node):
+        sub = ast.Subscript(value=ast.Name(id='_v', ctx=ast.Load()), slice=self.key(name), ctx=ast.Load())
+        return ast.copy_location(sub, node)
+
+def _parse(source: str) -> Tuple[ast.Expression, Tuple[str, ...]]:
+    tree = ast.parse(source.strip(), mode='eval')
+    variables: List[str] = []
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"Unsupported syntax '{type(node).__name__}' in expression '{source}'")
+        if isinstance(node, ast.Call):
+            continue
+        if isinstance(node, (ast.Name, ast.Attribute)):
+            name = _dotted_name(node)
+            if name in FUNCTIONS:
+                continue
+            if name is not None and name not in variables:
+                variables.append(name)
+    # Attributes nested in other attributes were collected as prefixes ('mass' of 'mass.s')
+    variables = [v for v in variables if not any(o.startswith(v + '.') for o in variables)]
+    return tree, tuple(variables)
+
+def _compile(tree: ast.Expression, key: Callable[[str], ast.expr], source: str) -> Callable:
+    body = _VariableRewriter(key).visit(copy.deepcopy(tree.body))
+    args = ast.arguments(posonlyargs=[], args=[ast.arg(arg='_v')], kwonlyargs=[],
+                         kw_defaults=[], defaults=[])
+    lam = ast.fix_missing_locations(ast.Expression(body=ast.Lambda(args=args, body=body)))
+    return eval(compile(lam, f'<expression {source!r}>', 'eval'), dict(FUNCTIONS))
+
+class Condition:
+    """
+    Stop condition compiled from an expression string such as 'F < 0' or 'mass.s > r'.
+    Called with a mapping it behaves like the equivalent lambda; bind() returns an evaluator
+    that reads the values by position from a per-step buffer. Pickles as its source string.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self._tree, self.variables = _parse(source)
+        self.by_name = _compile(self._tree, lambda n: ast.Constant(n), source)
+        self._bound: Dict[Tuple[str, ...], Callable] = {}
+
+    def __call__(self, values: Mapping[str, float]) -> bool:
+        return self.by_name(values)
+
+    def bind(self, layout: Sequence[str]) -> Callable[[Sequence[float]], bool]:
+        """Returns an evaluator taking a sequence whose entries are ordered like layout"""
+        layout = tuple(layout)
+        if layout not in self._bound:
+            missing = [v for v in self.variables if v not in layout]
+            if missing:
+                raise ValueError(f"Variables {missing} of '{self.source}' are not in the value buffer")
+            index = {name: i for i, name in enumerate(layout)}
+            self._bound[layout] = _compile(self._tree, lambda n: ast.Constant(index[n]), self.source)
+        return self._bound[layout]
+
+    def __reduce__(self):
+        return (self.__class__, (self.source,))
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.source!r})"
+
+class Transition:
+    """
+    Declarative next_mode: a list of (condition, mode) pairs checked in order, where a
+    condition of None always matches, e.g. [('vy > 0', 'FlyingBall'), (None, 'ContactBall')].
+    """
+
+    def __init__(self, rules: Sequence[Tuple[Optional[str], Optional[str]]]):
+        self.rules = [(None if cond is None else as_condition(cond), target) for cond, target in rules]
+        self.targets = tuple(dict.fromkeys(target for _, target in self.rules))
+        self.variables = tuple(dict.fromkeys(v for cond, _ in self.rules
+                                             for v in getattr(cond, 'variables', ())))
+
+    def __call__(self, values: Mapping[str, float]) -> Optional[str]:
+        for cond, target in self.rules:
+            if cond is None or cond(values):
+                return target
+        return None
+
+    def __reduce__(self):
+        return (self.__class__, ([(None if c is None else c.source, t) for c, t in self.rules],))
+
+def as_condition(spec):
+    """Compiles expression strings; Condition objects and callables are returned unchanged"""
+    if isinstance(spec, str):
+        return Condition(spec)
+    return spec
+
+def as_transition(spec):
+    """Compiles a list of (condition, mode) pairs; mode names, None and callables are returned unchanged"""
+    if isinstance(spec, (list, tuple)):
+        return Transition(spec)
+    return spec
@@ -0,0 +1,244 @@
+"""
+Streaming result sink writing FMUVSS segments and ContextModelica logs to a chunked, compressed
+HDF5 file while the simulation runs. Data is appended in chunks of `chunk_rows` rows and the
+file is flushed once another chunk's worth of rows has been written or FLUSH_INTERVAL has passed,
+so memory stays bounded by the chunk size and a crash keeps everything up to the last flush.
+
+Layout:
+  /segments/<index>_<mode>/time, /<variable>   FMUVSS, one group per mode segment; attributes
+                                               mode, columns, start_time, stop_time, stop_reason
+  /logs/<variable>/time, /value                ContextModelica, one group per logged variable
+  /switches/time, /mode                        every mode switch, appended as the run goes
+  root attributes                              run metadata; switch_times and switch_modes on close()
+"""
+import json
+from time import perf_counter
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Rows per chunk; a 20-column segment then buffers 20 * 8192 * 8 bytes = 1.3 MB
+CHUNK_ROWS = 8192
+
+# Longest time in seconds between two flushes; a flush costs about a millisecond, so many short
+# segments must not flush each
+FLUSH_INTERVAL = 1.0
+
+def _h5py():
+    try:
+        import h5py  # type: ignore
+    except ImportError as e:
+        raise ImportError("Streaming results to HDF5 requires h5py (pip install h5py)") from e
+    return h5py
+
+class _Columns:
+    """Resizable 1-D datasets in one group, appended to column-wise"""
+
+    def __init__(self, sink: 'HDF5Sink', group, names: Sequence[str]):
+        self.sink = sink
+        self.group = group
+        self.datasets = [group.create_dataset(name, shape=(0,), maxshape=(None,), dtype='f8',
+                                              chunks=(sink.chunk_rows,), compression=sink.compression,
+                                              compression_opts=sink.compression_opts)
+                         for name in names]
+        self.rows = 0
+
+    def write(self, block: np.ndarray):
+        """Appends block[i] to the i-th dataset"""
+        n = block.shape[1]
+        for dataset, column in zip(self.datasets, block):
+            dataset.resize((self.rows + n,))
+            dataset[self.rows:] = column
+        self.rows += n
+        self.sink.written(n)
+
+class SegmentWriter(_Columns):
+    """Target of a SegmentBuffer: time and one dataset per output of one FMUVSS mode segment"""
+
+    def __init__(self, sink: 'HDF5Sink', group, columns: Sequence[str]):
+        super().__init__(sink, group, ['time'] + list(columns))
+        self.columns = list(columns)
+        self.chunk_rows = sink.chunk_rows
+
+    @property
+    def time(self):
+        return self.datasets[0]
+
+    def as_dict(self) -> Dict[str, object]:
+        return dict(zip(self.columns, self.datasets[1:]))
+
+class ChunkedLog(_Columns):
+    """
+    A ContextModelica log of (time, value) tuples that keeps one chunk in memory. It can be
+    iterated, indexed and measured like the list it replaces; reads go to the file.
+    """
+
+    def __init__(self, sink: 'HDF5Sink', group):
+        super().__init__(sink, group, ['time', 'value'])
+        self._pending = np.empty((2, sink.chunk_rows))
+        self._n = 0
+
+    def append(self, entry: Tuple[float, float]):
+        if self._n == self._pending.shape[1]:
+            self.flush()
+        self._pending[0, self._n], self._pending[1, self._n] = entry
+        self._n += 1
+
+    def flush(self):
+        if self._n:
+            self.write(self._pending[:, :self._n])
+            self._n = 0
+
+    def __len__(self) -> int:
+        return self.rows + self._n
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the chunk not yet written"""
+        return self._pending.nbytes
+
+    def __getitem__(self, index: int) -> Tuple[float, float]:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        if index >= self.rows:
+            return tuple(self._pending[:, index - self.rows].tolist())
+        return float(self.datasets[0][index]), float(self.datasets[1][index])
+
+    def __iter__(self) -> Iterator[Tuple[float, float]]:
+        for start in range(0, self.rows, self.sink.chunk_rows):
+            times = self.datasets[0][start:start + self.sink.chunk_rows]
+            values = self.datasets[1][start:start + self.sink.chunk_rows]
+            yield from zip(times.tolist(), values.tolist())
+        yield from zip(self._pending[0, :self._n].tolist(), self._pending[1, :self._n].tolist())
+
+class SinkLogs(dict):
+    """Replaces ContextModelica's defaultdict(list) logs; 'mode' switches stay an in-memory list"""
+
+    def __init__(self, sink: 'HDF5Sink'):
+        super().__init__()
+        self.sink = sink
+
+    def __missing__(self, key):
+        if key == 'mode':
+            log = self[key] = []
+        else:
+            log = self[key] = ChunkedLog(self.sink, self.sink.file.require_group('logs').create_group(key))
+        return log
+
+    def flush(self):
+        for log in self.values():
+            if isinstance(log, ChunkedLog):
+                log.flush()
+
+class HDF5Sink:
+    """
+    Streams the results of one run into an HDF5 file. Pass it as `sink` to an engine. The file stays
+    open after run(), so results backed by its datasets remain readable until close().
+    """
+
+    def __init__(self, path, chunk_rows: int = CHUNK_ROWS, compression: Optional[str] = 'gzip',
+                 compression_opts: Optional[int] = 4):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.compression = compression
+        self.compression_opts = compression_opts if compression == 'gzip' else None
+        # 'latest' stores attributes densely, so the switch attributes may grow beyond 64 KB
+        self.file = _h5py().File(path, 'w', libver='latest')
+        self.switches: List[Tuple[float, str]] = []
+        self._written_switches = 0
+        self._switch_datasets = None  # (time, mode), created on the first flush with a switch
+        self._segments = 0
+        self._unflushed = 0  # Rows written since the last flush
+        self._flushed_at = perf_counter()
+
+    def set_metadata(self, **attrs):
+        """Stores run metadata as root attributes; non-scalar values are stored as JSON"""
+        for key, value in attrs.items():
+            if not isinstance(value, (str, int, float, bool)):
+                value = json.dumps(value, default=repr)
+            self.file.attrs[key] = value
+
+    def switch(self, sim_time: float, mode: str):
+        """Records a mode switch; flush() appends it to /switches"""
+        self.switches.append((sim_time, mode))
+
+    def begin_segment(self, mode: str, columns: Sequence[str], start_time: float) -> SegmentWriter:
+        group = self.file.require_group('segments').create_group(f"{self._segments:05d}_{mode}")
+        group.attrs['mode'] = mode
+        group.attrs['start_time'] = start_time
+        group.attrs['columns'] = list(columns)
+        self._segments += 1
+        self.switch(start_time, mode)
+        return SegmentWriter(self, group, columns)
+
+    def end_segment(self, result: dict):
+        """Stores the metadata of a finished FMUVSS result on its group and links the result to it"""
+        group = self.file['segments'][f"{self._segments - 1:05d}_{result['mode']}"]
+        for key in ('stop_time', 'stop_reason'):
+            group.attrs[key] = result[key]
+        result['dataset'] = group.name
+        self.written(0)
+
+    def logs(self) -> SinkLogs:
+        return SinkLogs(self)
+
+    def written(self, rows: int):
+        """Counts rows appended to the file and flushes it once a chunk's worth or FLUSH_INTERVAL has passed"""
+        self._unflushed += rows
+        if self._unflushed >= self.chunk_rows or perf_counter() - self._flushed_at >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        self._write_switches()
+        self.file.flush()
+        self._unflushed = 0
+        self._flushed_at = perf_counter()
+
+    def _write_switches(self):
+        """Appends the switches recorded since the last call; rewriting attributes instead would grow the file quadratically"""
+        new = self.switches[self._written_switches:]
+        if not new:
+            return
+        if self._switch_datasets is None:
+            group = self.file.require_group('switches')
+            self._switch_datasets = (
+                group.create_dataset('time', shape=(0,), maxshape=(None,), dtype='f8', chunks=(1024,)),
+                group.create_dataset('mode', shape=(0,), maxshape=(None,), dtype=_h5py().string_dtype(),
+                                     chunks=(1024,)))
+        start = self._written_switches
+        for dataset, values in zip(self._switch_datasets, zip(*new)):
+            dataset.resize((start + len(new),))
+            dataset[start:] = values
+        self._written_switches = len(self.switches)
+
+    def close(self):
+        """Flushes and closes the file; the switches are also stored once as root attributes"""
+        if self.file.id.valid:
+            self.flush()
+            if self.switches:
+                self.file.attrs['switch_times'] = np.array([t for t, _ in self.switches])
+                self.file.attrs['switch_modes'] = [m for _, m in self.switches]
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_segments(path) -> List[dict]:
+    """Reads a sink file back into results shaped like FMUVSS.results"""
+    h5py = _h5py()
+    results = []
+    with h5py.File(path, 'r') as f:
+        for name in sorted(f.get('segments', {})):
+            group = f['segments'][name]
+            results.append({
+                'mode': group.attrs['mode'],
+                'time': group['time'][:],
+                'data': {key: group[key][:] for key in group.attrs['columns']},
+                **{key: group.attrs[key] for key in ('start_time', 'stop_time', 'stop_reason') if key in group.attrs},
+            })
+    return results
@@ -0,0 +1,203 @@
+import os
+import sys
+import tracemalloc
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional
+
+import numpy as np
+
+# Steps between two budget checks, counted over the whole run; reading the RSS costs a few microseconds
+CHECK_EVERY = 10000
+
+ON_BUDGET = ('abort', 'spill')
+
+def rss_mb() -> Optional[float]:
+    """Current resident set size in MB, None where /proc is not available"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def dir_bytes(path) -> int:
+    """Size of the files below a directory, e.g. an FMU extraction"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def result_bytes(results: Iterable[dict]) -> Dict[str, Dict[str, int]]:
+    """{mode: {variable: bytes}} held in memory by FMUVSS results; spilled and sink-backed segments count 0"""
+    usage: Dict[str, Dict[str, int]] = {}
+    for result in results:
+        if 'spilled' in result or 'dataset' in result:
+            continue
+        mode = usage.setdefault(result['mode'], {})
+        mode['time'] = mode.get('time', 0) + result['time'].nbytes
+        for name, column in result['data'].items():
+            mode[name] = mode.get(name, 0) + column.nbytes
+    return usage
+
+def log_bytes(logs: Mapping[str, list], per_mode: bool = True) -> Dict[str, Dict[str, int]]:
+    """
+    {mode: {variable: bytes}} held by ContextModelica logs of (time, value) tuples. Entries are
+    assigned to modes by the switch times in logs['mode']; their size is taken from the first entry.
+    Without per_mode, all entries count under 'run', which takes constant time per variable.
+    """
+    switches = logs.get('mode', [])
+    usage: Dict[str, Dict[str, int]] = {}
+    for name, entries in logs.items():
+        if not entries:
+            continue
+        if not isinstance(entries, list):  # A log streamed to a sink holds only its pending chunk
+            usage.setdefault('run', {})[name] = getattr(entries, 'nbytes', 0)
+            continue
+        first = entries[0]
+        entry = sys.getsizeof(first) + sum(sys.getsizeof(item) for item in first) + 8  # + list slot
+        if not per_mode:
+            usage.setdefault('run', {})[name] = len(entries) * entry
+            continue
+        counts: Dict[str, int] = {}
+        i = 0
+        for t, _ in entries:
+            while i + 1 < len(switches) and switches[i + 1][0] <= t:
+                i += 1
+            mode = switches[i][1] if switches else 'run'
+            counts[mode] = counts.get(mode, 0) + 1
+        for mode, count in counts.items():
+            usage.setdefault(mode, {})[name] = count * entry
+    return usage
+
+def spill(result: dict, directory: Path, index: int) -> Path:
+    """
+    Moves the arrays of one FMUVSS result to a .npy file and replaces them with read-only
+    memory-mapped views, so the result stays usable while its pages can leave RAM.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"segment_{index:05d}_{result['mode']}.npy"
+    names = list(result['data'])
+    block = np.lib.format.open_memmap(path, mode='w+', shape=(len(names) + 1, len(result['time'])))
+    block[0] = result['time']
+    for i, name in enumerate(names, 1):
+        block[i] = result['data'][name]
+    block.flush()
+    del block
+    block = np.load(path, mmap_mode='r')
+    result['time'] = block[0]
+    result['data'] = {name: block[i] for i, name in enumerate(names, 1)}
+    result['spilled'] = str(path)
+    return path
+
+class MemoryMonitor:
+    """
+    Samples memory at every mode switch: RSS, bytes held by results, live FMU instances and
+    extraction directories, and (if enabled) the tracemalloc allocations added since the last
+    switch. With a budget, engines call `check()` at every mode switch and every `check_every` steps
+    of the run (`due()`), which spills results or tells them to abort. `top` limits the allocations
+    listed per switch and the variables listed per mode.
+    """
+
+    def __init__(self, trace_allocations: bool = False, budget_mb: Optional[float] = None,
+                 on_budget: str = 'abort', spill_dir=None, check_every: int = CHECK_EVERY, top: int = 5):
+        if on_budget not in ON_BUDGET:
+            raise ValueError(f"Unknown on_budget '{on_budget}', expected one of {list(ON_BUDGET)}")
+        self.trace_allocations = trace_allocations
+        self.budget_mb = budget_mb
+        self.on_budget = on_budget
+        self.spill_dir = Path(spill_dir) if spill_dir is not None else Path('spill')
+        self.check_every = check_every
+        self.top = top
+        self.switches: List[dict] = []
+        self.usage: Dict[str, Dict[str, int]] = {}
+        self._snapshot = None
+        self._started_tracing = False
+        self._dir_sizes: Dict[str, int] = {}  # Extraction directories do not change during a run
+        self._countdown = check_every
+
+    def start(self):
+        if self.trace_allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            self._snapshot = tracemalloc.take_snapshot()
+
+    def stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        self._snapshot = None
+
+    def due(self) -> bool:
+        """Counts one step; True on every check_every-th step of the run, across mode switches"""
+        self._countdown -= 1
+        if self._countdown > 0:
+            return False
+        self._countdown = self.check_every
+        return True
+
+    def check(self, results: Optional[List[dict]] = None) -> bool:
+        """True if the budget is exceeded and enforcing it did not help, i.e. the run has to stop"""
+        return self.over_budget() and self.enforce(results)
+
+    def over_budget(self) -> bool:
+        if self.budget_mb is None:
+            return False
+        rss = rss_mb()
+        return rss is not None and rss > self.budget_mb
+
+    def enforce(self, results: Optional[List[dict]] = None) -> bool:
+        """
+        Handles an exceeded budget: spills the results not spilled yet if on_budget is 'spill'.
+        Returns True if the run has to abort, i.e. there was nothing to spill or it did not help.
+        """
+        if self.on_budget == 'spill' and results:
+            pending = [i for i, result in enumerate(results) if 'spilled' not in result and 'dataset' not in result]
+            for i in pending:
+                spill(results[i], self.spill_dir, i)
+            if pending:
+                return self.over_budget()
+        return True
+
+    def switch(self, mode: Optional[str], sim_time: float, usage: Dict[str, Dict[str, int]],
+               fmus: int = 0, dirs: Iterable = ()):
+        """Records one sample; `usage` is the result_bytes or log_bytes of the run so far"""
+        dirs = [d for d in dirs if d is not None]
+        entry = {'mode': mode, 'time': sim_time, 'rss_mb': rss_mb(),
+                 'result_bytes': sum(sum(v.values()) for v in usage.values()),
+                 'fmu_instances': fmus, 'extract_dirs': len(dirs),
+                 'extract_bytes': sum(self._dir_size(d) for d in dirs)}
+        if self._snapshot is not None:
+            snapshot = tracemalloc.take_snapshot()
+            diff = snapshot.compare_to(self._snapshot, 'lineno')[:self.top]
+            entry['allocations'] = [str(stat) for stat in diff]
+            self._snapshot = snapshot
+        self.usage = usage
+        self.switches.append(entry)
+        return entry
+
+    def _dir_size(self, path) -> int:
+        size = self._dir_sizes.get(str(path))
+        if size is None:
+            size = self._dir_sizes[str(path)] = dir_bytes(path)
+        return size
+
+    def report(self) -> str:
+        lines = [f"{'t':>12} {'mode':<20}{'RSS [MB]':>10}{'results [MB]':>14}{'FMUs':>6}{'extracted [MB]':>16}"]
+        for e in self.switches:
+            rss = '-' if e['rss_mb'] is None else f"{e['rss_mb']:.1f}"
+            lines.append(f"{e['time']:>12.4g} {str(e['mode']):<20}{rss:>10}{e['result_bytes'] / 2**20:>14.2f}"
+                         f"{e['fmu_instances']:>6}{e['extract_bytes'] / 2**20:>16.2f}")
+            for stat in e.get('allocations', []):
+                lines.append(f"{'':>14}{stat}")
+        lines.append("Result memory per mode and variable [MB]:")
+        for mode, variables in self.usage.items():
+            largest = sorted(variables.items(), key=lambda item: -item[1])
+            cells = ', '.join(f"{name}={size / 2**20:.2f}" for name, size in largest[:self.top])
+            if len(largest) > self.top:
+                cells += f", {len(largest) - self.top} more: {sum(size for _, size in largest[self.top:]) / 2**20:.2f}"
+            lines.append(f"  {mode}: {cells}")
+        return '\n'.join(lines)
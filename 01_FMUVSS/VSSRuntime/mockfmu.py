@@ -0,0 +1,291 @@
+"""
+Pure-Python stand-ins for co-simulation FMUs. A mode uses one by giving a mock path instead of
+a .fmu file, e.g. 'mock:pendulum?vars=50&cost=2e-6&L=2'. The dynamics are analytic, so a run
+measures the orchestration around the FMU rather than a solver:
+
+- vars: number of extra local variables e0, e1, ... (default 0), updated every step
+- cost: busy-wait per step in seconds (default 0), standing in for solver work
+- any other key overrides the start value of a variable
+"""
+import math
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl
+
+import numpy as np
+
+from .modeldescription import ModelVariable
+
+MOCK_SCHEME = 'mock:'
+
+def is_mock(path) -> bool:
+    """True if an fmu_path names a mock FMU"""
+    return isinstance(path, str) and path.startswith(MOCK_SCHEME)
+
+class _Dynamics:
+    """Variables (name, causality, start) and the exact update of one analytic model"""
+    variables: Tuple[Tuple[str, str, float], ...] = ()
+
+    def initialize(self, v: np.ndarray):
+        """Derives the dependent variables from the states after start values were set"""
+
+    def step(self, v: np.ndarray, dt: float):
+        raise NotImplementedError
+
+class _Ball(_Dynamics):
+    """Ball in free flight under constant gravity"""
+    variables = (('x', 'output', 0.0), ('h', 'output', 1.0), ('vx', 'output', 1.0), ('vy', 'output', 0.0),
+                 ('g', 'parameter', 9.81), ('r', 'parameter', 0.1))
+
+    def step(self, v, dt):
+        v[0] += v[2] * dt
+        v[1] += v[3] * dt - 0.5 * v[4] * dt * dt
+        v[3] -= v[4] * dt
+
+class _Pendulum(_Dynamics):
+    """Linearized pendulum, exact for the small-angle equation"""
+    variables = (('phi', 'output', 0.5), ('dphi', 'output', 0.0), ('x', 'output', 0.0), ('y', 'output', 0.0),
+                 ('dx', 'output', 0.0), ('dy', 'output', 0.0), ('F', 'output', 0.0),
+                 ('L', 'parameter', 1.0), ('g', 'parameter', 9.81), ('m', 'parameter', 1.0))
+
+    def initialize(self, v):
+        phi, dphi, L, g, m = v[0], v[1], v[7], v[8], v[9]
+        v[2] = L * math.sin(phi)
+        v[3] = -L * math.cos(phi)
+        v[4] = L * math.cos(phi) * dphi
+        v[5] = L * math.sin(phi) * dphi
+        v[6] = m * g * math.cos(phi) + m * L * dphi ** 2
+
+    def step(self, v, dt):
+        w = math.sqrt(v[8] / v[7])
+        c, s = math.cos(w * dt), math.sin(w * dt)
+        v[0], v[1] = v[0] * c + v[1] / w * s, -v[0] * w * s + v[1] * c
+        self.initialize(v)
+
+class _Ramp(_Dynamics):
+    """Signal rising at a constant slope"""
+    variables = (('y', 'output', 0.0), ('slope', 'parameter', 1.0))
+
+    def step(self, v, dt):
+        v[0] += v[1] * dt
+
+DYNAMICS = {'ball': _Ball, 'pendulum': _Pendulum, 'ramp': _Ramp}
+
+@dataclass(frozen=True)
+class MockSpec:
+    dynamics: str
+    extra: int = 0
+    cost: float = 0.0
+    starts: Tuple[Tuple[str, float], ...] = ()
+
+@lru_cache(maxsize=None)
+def parse_mock_path(path: str) -> MockSpec:
+    """Splits 'mock:<dynamics>?key=value&...' into a MockSpec"""
+    if not is_mock(path):
+        raise ValueError(f"'{path}' is not a mock FMU path")
+    name, _, query = path[len(MOCK_SCHEME):].partition('?')
+    if name not in DYNAMICS:
+        raise ValueError(f"Unknown mock dynamics '{name}', expected one of {sorted(DYNAMICS)}")
+    options = dict(parse_qsl(query, strict_parsing=bool(query)))
+    extra = int(options.pop('vars', 0))
+    cost = float(options.pop('cost', 0.0))
+    known = {var[0] for var in DYNAMICS[name].variables}
+    unknown = [key for key in options if key not in known]
+    if unknown:
+        raise ValueError(f"Mock '{name}' has no variables {unknown}")
+    return MockSpec(name, extra, cost, tuple((key, float(val)) for key, val in options.items()))
+
+def _layout(spec: MockSpec) -> List[Tuple[str, str, Optional[float]]]:
+    """All variables in value-reference order: model variables, currentTime, extra variables"""
+    starts = dict(spec.starts)
+    layout = [(name, causality, starts.get(name, start)) for name, causality, start in DYNAMICS[spec.dynamics].variables]
+    layout.append(('currentTime', 'output', None))
+    layout.extend((f'e{i}', 'local', None) for i in range(spec.extra))
+    return layout
+
+@lru_cache(maxsize=None)
+def mock_variables(path: str) -> Dict[str, ModelVariable]:
+    """The model variables of a mock, like read_model_variables for a .fmu"""
+    return {name: ModelVariable(name=name, value_reference=vr, type='Real', causality=causality,
+                                variability='fixed' if causality == 'parameter' else 'continuous',
+                                has_start=start is not None)
+            for vr, (name, causality, start) in enumerate(_layout(parse_mock_path(path)))}
+
+@dataclass(frozen=True)
+class MockScalarVariable:
+    """The fields of fmpy's ModelVariable the engines read"""
+    name: str
+    valueReference: int
+    type: str = 'Float64'
+    causality: str = 'local'
+    variability: str = 'continuous'
+
+@dataclass(frozen=True)
+class MockCoSimulation:
+    modelIdentifier: str
+
+@dataclass(frozen=True)
+class MockModelDescription:
+    """The fields of fmpy's ModelDescription the engines read"""
+    modelName: str
+    guid: str
+    coSimulation: MockCoSimulation
+    modelVariables: List[MockScalarVariable] = field(default_factory=list)
+    fmiVersion: str = '3.0'
+
+@lru_cache(maxsize=None)
+def read_mock_description(path: str) -> MockModelDescription:
+    """The model description of a mock, like fmpy.read_model_description for a .fmu"""
+    spec = parse_mock_path(path)
+    name = f"Mock{spec.dynamics.capitalize()}"
+    return MockModelDescription(
+        modelName=name,
+        guid=path,
+        coSimulation=MockCoSimulation(name),
+        modelVariables=[MockScalarVariable(v.name, v.value_reference, 'Float64', v.causality, v.variability)
+                        for v in mock_variables(path).values()],
+    )
+
+class MockFMU:
+    """State and stepping shared by the pyfmi and fmpy flavoured mocks"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.spec = parse_mock_path(path)
+        self.dynamics = DYNAMICS[self.spec.dynamics]()
+        layout = _layout(self.spec)
+        self._starts = np.array([0.0 if start is None else start for _, _, start in layout])
+        self._refs = {name: vr for vr, (name, _, _) in enumerate(layout)}
+        self._time_ref = len(self.dynamics.variables)
+        self._extra = slice(self._time_ref + 1, len(layout))
+        self._scale = np.arange(1, self.spec.extra + 1, dtype=float)
+        self._reset_values()
+
+    def _reset_values(self):
+        self.values = self._starts.copy()
+        self.time = 0.0
+        self.steps = 0
+
+    def _initialize(self):
+        self.values[self._time_ref] = self.time
+        self.dynamics.initialize(self.values)
+
+    def _step(self, t: float, h: float):
+        self.dynamics.step(self.values, h)
+        self.time = t + h
+        self.values[self._time_ref] = self.time
+        if self.spec.extra:
+            np.multiply(self._scale, self.time, out=self.values[self._extra])
+        if self.spec.cost:
+            end = time.perf_counter() + self.spec.cost
+            while time.perf_counter() < end:
+                pass
+        self.steps += 1
+
+    def _get(self, vrs: Sequence[int]) -> np.ndarray:
+        return self.values[np.asarray(vrs, dtype=int)]
+
+    def _set(self, vrs: Sequence[int], values: Sequence):
+        self.values[np.asarray(vrs, dtype=int)] = values
+
+class MockFMU2(MockFMU):
+    """The part of pyfmi's FMUModelCS2 used by the FMI 2.0 engine"""
+
+    def setup_experiment(self, tolerance_defined=True, tolerance=None, start_time=0.0,
+                         stop_time_defined=False, stop_time=None):
+        self.time = start_time
+
+    def initialize(self, *args, **kwargs):
+        self._initialize()
+
+    def do_step(self, current_t: float, step_size: float, new_step: bool = True) -> int:
+        self._step(current_t, step_size)
+        return 0
+
+    def get_variable_valueref(self, name: str) -> int:
+        return self._refs[name]
+
+    def get(self, names):
+        names = [names] if isinstance(names, str) else names
+        return self._get([self._refs[name] for name in names])
+
+    def set(self, names, values):
+        if isinstance(names, str):
+            names, values = [names], [values]
+        self._set([self._refs[name] for name in names], values)
+
+    def get_real(self, vrs):
+        return self._get(vrs)
+
+    def set_real(self, vrs, values):
+        self._set(vrs, values)
+
+    def get_integer(self, vrs):
+        return self._get(vrs).astype(int)
+
+    def set_integer(self, vrs, values):
+        self._set(vrs, values)
+
+    def get_boolean(self, vrs):
+        return self._get(vrs).astype(bool)
+
+    def set_boolean(self, vrs, values):
+        self._set(vrs, values)
+
+    def terminate(self):
+        pass
+
+    def reset(self):
+        self._reset_values()
+
+class MockFMU3(MockFMU):
+    """The part of fmpy's FMU3Slave used by the FMI 3.0 engine and ContextModelica"""
+
+    def __init__(self, path: str, instanceName: Optional[str] = None, **kwargs):
+        super().__init__(path)
+        self.instanceName = instanceName
+
+    def instantiate(self, *args, **kwargs):
+        self._reset_values()
+
+    def enterInitializationMode(self, tolerance=None, startTime=0.0, stopTime=None):
+        self.time = startTime
+
+    def exitInitializationMode(self):
+        self._initialize()
+
+    def doStep(self, currentCommunicationPoint: float, communicationStepSize: float,
+               noSetFMUStatePriorToCurrentPoint: bool = True):
+        self._step(currentCommunicationPoint, communicationStepSize)
+        return False, False, False, self.time  # eventHandlingNeeded, terminateSimulation, earlyReturn, lastSuccessfulTime
+
+    def getFloat64(self, vrs, nValues=None) -> list:
+        return self._get(vrs).tolist()
+
+    def setFloat64(self, vrs, values):
+        self._set(vrs, values)
+
+    def getInt64(self, vrs, nValues=None) -> list:
+        return self._get(vrs).astype(int).tolist()
+
+    def setInt64(self, vrs, values):
+        self._set(vrs, values)
+
+    getInt32, setInt32 = getInt64, setInt64
+
+    def getBoolean(self, vrs, nValues=None) -> list:
+        return self._get(vrs).astype(bool).tolist()
+
+    def setBoolean(self, vrs, values):
+        self._set(vrs, values)
+
+    def terminate(self):
+        pass
+
+    def reset(self):
+        self._reset_values()
+
+    def freeInstance(self):
+        pass
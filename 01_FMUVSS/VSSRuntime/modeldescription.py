@@ -0,0 +1,53 @@
+import xml.etree.ElementTree as ET
+import zipfile
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict
+
+# FMI 3.0 lists variables by type tag, FMI 2.0 nests the type inside a ScalarVariable
+_FMI3_TYPES = ('Float32', 'Float64', 'Int8', 'UInt8', 'Int16', 'UInt16', 'Int32', 'UInt32',
+               'Int64', 'UInt64', 'Boolean', 'String', 'Binary', 'Enumeration', 'Clock')
+
+@dataclass(frozen=True)
+class ModelVariable:
+    name: str
+    value_reference: int
+    type: str  # 'Real', 'Integer', 'Boolean', 'String', 'Enumeration' (FMI 2.0) or the FMI 3.0 tag
+    causality: str = 'local'
+    variability: str = 'continuous'
+    has_start: bool = False
+
+    @property
+    def settable(self) -> bool:
+        """True if the variable may be set before initialization"""
+        return self.has_start and self.causality != 'independent' and self.variability != 'constant'
+
+@lru_cache(maxsize=None)
+def read_model_variables(fmu_path: str) -> Dict[str, ModelVariable]:
+    """Reads the model variables from modelDescription.xml without extracting the FMU"""
+    from .mockfmu import is_mock, mock_variables
+    if is_mock(fmu_path):
+        return mock_variables(fmu_path)
+    with zipfile.ZipFile(fmu_path) as archive:
+        root = ET.fromstring(archive.read('modelDescription.xml'))
+
+    variables = {}
+    for node in root.find('ModelVariables'):
+        if node.tag == 'ScalarVariable':
+            type_node = next(iter(node))
+            vtype = type_node.tag
+            has_start = 'start' in type_node.attrib
+        elif node.tag in _FMI3_TYPES:
+            vtype = node.tag
+            has_start = 'start' in node.attrib or node.find('Start') is not None
+        else:
+            continue
+        variables[node.get('name')] = ModelVariable(
+            name=node.get('name'),
+            value_reference=int(node.get('valueReference')),
+            type=vtype,
+            causality=node.get('causality', 'local'),
+            variability=node.get('variability', 'continuous'),
+            has_start=has_start,
+        )
+    return variables
@@ -0,0 +1,82 @@
+import os
+import sys
+import threading
+from collections import Counter
+from typing import Dict, Optional
+
+# Seconds between two samples; at 5 ms a sample costs well under 1% of the sampled thread's time
+INTERVAL = 0.005
+
+PROFILERS = ('sampling',)
+
+class SamplingProfiler:
+    """
+    Samples the Python stack of one thread at a fixed interval from a background thread.
+    Samples are counted per mode (set `mode` when the simulation enters one) and written as
+    folded stacks, 'mode;outer;...;inner count' per line, the input of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval: float = INTERVAL):
+        self.interval = interval
+        self.mode: Optional[str] = None
+        self.samples: Dict[Optional[str], Counter] = {}
+        self._labels = {}  # Code object -> frame label
+        self._stop = threading.Event()
+        self._thread = None
+        self._target = None
+
+    def start(self):
+        """Starts sampling the calling thread"""
+        self._target = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name='SamplingProfiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            counts = self.samples.get(self.mode)
+            if counts is None:
+                counts = self.samples[self.mode] = Counter()
+            counts[tuple(stack)] += 1
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def summary(self) -> Dict[str, int]:
+        """Number of samples per mode"""
+        return {mode or 'run': sum(counts.values()) for mode, counts in self.samples.items()}
+
+    def folded(self):
+        """Folded stack lines, rooted at the mode the samples were taken in"""
+        for mode, counts in self.samples.items():
+            for stack, count in counts.items():
+                frames = ';'.join(self._label(code) for code in reversed(stack))
+                yield f"{mode or 'run'};{frames} {count}"
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for line in self.folded():
+                f.write(line + '\n')
@@ -0,0 +1,56 @@
+from time import perf_counter
+from typing import Dict, List
+
+# Phases of a simulation loop; the constants index ModeTimers.times and .counts
+PHASES = ('load', 'initialize', 'step', 'read', 'condition', 'fire', 'log', 'transition')
+LOAD, INITIALIZE, STEP, READ, CONDITION, FIRE, LOG, TRANSITION = range(len(PHASES))
+
+class ModeTimers:
+    """
+    Wall time and call counts per phase of one mode. `start()` sets a mark and every `lap(phase)`
+    books the time since the previous mark on that phase, so consecutive phases need one clock
+    read each and nothing is allocated per step.
+    """
+    __slots__ = ('times', 'counts', 'mark')
+
+    def __init__(self):
+        self.times: List[float] = [0.0] * len(PHASES)
+        self.counts: List[int] = [0] * len(PHASES)
+        self.mark = 0.0
+
+    def start(self):
+        self.mark = perf_counter()
+
+    def lap(self, phase: int):
+        now = perf_counter()
+        self.times[phase] += now - self.mark
+        self.counts[phase] += 1
+        self.mark = now
+
+class PhaseTimers:
+    """Per-mode phase timers of one run; a mode entered several times accumulates into one entry"""
+
+    def __init__(self):
+        self.modes: Dict[str, ModeTimers] = {}
+
+    def mode(self, name: str) -> ModeTimers:
+        timers = self.modes.get(name)
+        if timers is None:
+            timers = self.modes[name] = ModeTimers()
+        return timers
+
+    def summary(self) -> Dict[str, Dict[str, dict]]:
+        """{mode: {phase: {'time': seconds, 'calls': n}}} for every phase that was used"""
+        return {mode: {phase: {'time': t.times[i], 'calls': t.counts[i]}
+                       for i, phase in enumerate(PHASES) if t.counts[i]}
+                for mode, t in self.modes.items()}
+
+    def report(self) -> str:
+        """Table of the time per phase and mode, with each phase's share of the mode's total"""
+        used = [i for i in range(len(PHASES)) if any(t.counts[i] for t in self.modes.values())]
+        lines = [f"{'mode':<24}" + ''.join(f"{PHASES[i]:>16}" for i in used) + f"{'total [s]':>12}"]
+        for mode, t in self.modes.items():
+            total = sum(t.times)
+            cells = ''.join(f"{t.times[i]:>9.3f} {t.times[i] / total if total else 0:>5.0%}" for i in used)
+            lines.append(f"{mode:<24}{cells}{total:>12.3f}")
+        return '\n'.join(lines)
@@ -0,0 +1,103 @@
+import json
+import os
+from time import perf_counter
+from typing import Dict, Mapping, Optional, Sequence
+
+# Every n-th sample() call is written as counter events, which keeps traces of long runs small
+SAMPLE_EVERY = 100
+
+class TraceRecorder:
+    """
+    Collects events in the Chrome Trace Event Format, viewable in Perfetto (ui.perfetto.dev) or
+    chrome://tracing. Timestamps are wall time since the recorder was created.
+
+    Mode segments are spans on the 'modes' track. FMU lifecycle calls are spans nested inside
+    them: `begin_mode()` sets a mark and each `lap(name)` closes a span from the previous mark.
+    Context activations get one track per context, and sampled values become counter tracks.
+    """
+
+    def __init__(self, process: str = 'simulation', sample_every: int = SAMPLE_EVERY):
+        self.sample_every = sample_every
+        self.events = []
+        self._origin = perf_counter()
+        self._pid = os.getpid()
+        self._tracks: Dict[str, int] = {}
+        self._mode = None  # (name, start, args) of the open mode span
+        self._mark = self._origin
+        self._active: Dict[str, float] = {}  # Context -> start of its open activation span
+        self._countdown = 1
+        self.events.append({'name': 'process_name', 'ph': 'M', 'pid': self._pid, 'args': {'name': process}})
+
+    def _us(self, t: float) -> float:
+        return round((t - self._origin) * 1e6, 3)
+
+    def track(self, name: str) -> int:
+        """Thread id of a named track; tracks are listed in the order they were first used"""
+        tid = self._tracks.get(name)
+        if tid is None:
+            tid = self._tracks[name] = len(self._tracks) + 1
+            self.events.append({'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': tid, 'args': {'name': name}})
+            self.events.append({'name': 'thread_sort_index', 'ph': 'M', 'pid': self._pid, 'tid': tid,
+                                'args': {'sort_index': tid}})
+        return tid
+
+    def span(self, name: str, start: float, end: float, track: str = 'modes', cat: str = 'fmu',
+             args: Optional[dict] = None):
+        """A complete event between two perf_counter() times"""
+        event = {'name': name, 'cat': cat, 'ph': 'X', 'ts': self._us(start), 'dur': round((end - start) * 1e6, 3),
+                 'pid': self._pid, 'tid': self.track(track)}
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    def begin_mode(self, mode: str, sim_time: float):
+        now = perf_counter()
+        self._mode = (mode, now, {'start_time': sim_time})
+        self._mark = now
+
+    def lap(self, name: str, **args):
+        """Span from the previous mark (mode entry or lap) until now, nested in the current mode"""
+        now = perf_counter()
+        self.span(name, self._mark, now, args=args)
+        self._mark = now
+
+    def mark(self):
+        self._mark = perf_counter()
+
+    def end_mode(self, sim_time: float, **args):
+        if self._mode is None:
+            return
+        mode, start, mode_args = self._mode
+        mode_args.update(stop_time=sim_time, **args)
+        self.span(mode, start, perf_counter(), cat='mode', args=mode_args)
+        self._mode = None
+
+    def contexts(self, states: Mapping[str, bool], sim_time: float):
+        """Opens or closes the activation span of every context whose state changed"""
+        now = perf_counter()
+        for name, active in states.items():
+            if active and name not in self._active:
+                self._active[name] = now
+            elif not active and name in self._active:
+                self.span(name, self._active.pop(name), now, track=f'context {name}', cat='context',
+                          args={'deactivated_at': sim_time})
+
+    def sample(self, names: Sequence[str], values: Sequence[float]):
+        """Writes the values as counter events on every sample_every-th call"""
+        self._countdown -= 1
+        if self._countdown:
+            return
+        self._countdown = self.sample_every
+        ts = self._us(perf_counter())
+        for name, value in zip(names, values):
+            self.events.append({'name': name, 'cat': 'value', 'ph': 'C', 'ts': ts, 'pid': self._pid,
+                                'args': {name: float(value)}})
+
+    def close(self, sim_time: float):
+        """Ends the open mode span and every open context activation"""
+        self.end_mode(sim_time, stop_reason='end')
+        self.contexts(dict.fromkeys(self._active, False), sim_time)
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)
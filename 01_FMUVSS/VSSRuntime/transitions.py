@@ -0,0 +1,103 @@
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from .expressions import Transition
+from .modeldescription import ModelVariable
+
+# pyfmi accessors per FMI 2.0 base type
+GETTERS = {'Real': 'get_real', 'Integer': 'get_integer', 'Enumeration': 'get_integer',
+           'Boolean': 'get_boolean', 'String': 'get_string'}
+SETTERS = {'Real': 'set_real', 'Integer': 'set_integer', 'Enumeration': 'set_integer',
+           'Boolean': 'set_boolean', 'String': 'set_string'}
+
+class BatchedAccess:
+    """Reads or writes a fixed list of variables with one call per base type"""
+
+    def __init__(self, variables: Sequence[ModelVariable]):
+        self.names = [var.name for var in variables]
+        groups: Dict[str, Tuple[List[int], List[int]]] = {}
+        for pos, var in enumerate(variables):
+            vrs, positions = groups.setdefault(var.type, ([], []))
+            vrs.append(var.value_reference)
+            positions.append(pos)
+        self.groups = [(GETTERS[vtype], SETTERS[vtype], vrs, positions)
+                       for vtype, (vrs, positions) in groups.items()]
+
+    def __len__(self):
+        return len(self.names)
+
+    def read(self, fmu) -> list:
+        """Returns the current values ordered like `names`"""
+        values = [None] * len(self.names)
+        for getter, _, vrs, positions in self.groups:
+            for pos, val in zip(positions, getattr(fmu, getter)(vrs)):
+                values[pos] = val
+        return values
+
+    def write(self, fmu, values: Sequence):
+        """Sets values ordered like `names`"""
+        for _, setter, vrs, positions in self.groups:
+            getattr(fmu, setter)(vrs, [values[pos] for pos in positions])
+
+class HandOver:
+    """Precompiled transfer of final values from the FMU of one mode into the FMU of the next"""
+
+    def __init__(self, source: str, target: str, pairs: Sequence[Tuple[ModelVariable, ModelVariable]]):
+        self.source = source
+        self.target = target
+        self.reads = BatchedAccess([src for src, _ in pairs])
+        self.writes = BatchedAccess([dst for _, dst in pairs])
+
+    def harvest(self, fmu) -> list:
+        """Reads the handed-over values from the leaving FMU"""
+        return self.reads.read(fmu)
+
+    def apply(self, fmu, values: Sequence):
+        """Writes harvested values into the entered FMU before initialization"""
+        self.writes.write(fmu, values)
+
+    def __repr__(self):
+        pairs = ', '.join(f'{s}->{d}' for s, d in zip(self.reads.names, self.writes.names))
+        return f"{self.__class__.__name__}({self.source!r} -> {self.target!r}: {pairs})"
+
+def _targets(transition, modes) -> List[str]:
+    """Modes a transition can lead to; callables may pick any mode"""
+    if isinstance(transition, Transition):
+        return [t for t in transition.targets if t is not None]
+    if callable(transition):
+        return list(modes)
+    return [] if transition is None else [transition]
+
+def compile_hand_overs(modes: Mapping[str, dict], transitions: Mapping[str, object],
+                       variables: Mapping[str, Mapping[str, ModelVariable]]) -> Dict[Tuple[str, str], HandOver]:
+    """
+    Builds one HandOver per reachable (from_mode, to_mode) pair. An explicit transition_mapping
+    entry hands over exactly its pairs; every variable must exist in the respective FMU. Without
+    one (or with {}), the outputs and parameters of the leaving mode are passed on under their
+    own names, limited to those the target FMU can set.
+    """
+    plans = {}
+    for source, mode in modes.items():
+        src_vars = variables[source]
+        mappings = mode.get('transition_mapping', {})
+        for target in mappings:
+            if target not in modes:
+                raise ValueError(f"Transition mapping of '{source}' refers to unknown mode '{target}'")
+
+        for target in _targets(transitions[source], modes):
+            if target not in modes:
+                raise ValueError(f"Next mode '{target}' of '{source}' is not a defined mode")
+            dst_vars = variables[target]
+            mapping: Optional[dict] = mappings.get(target)
+            if mapping:
+                for src, dst in mapping.items():
+                    if src not in src_vars:
+                        raise ValueError(f"Variable '{src}' of the transition from '{source}' to '{target}' does not exist in '{source}'")
+                    if dst not in dst_vars:
+                        raise ValueError(f"Variable '{dst}' of the transition from '{source}' to '{target}' does not exist in '{target}'")
+                pairs = [(src_vars[src], dst_vars[dst]) for src, dst in mapping.items()]
+            else:
+                names = list(mode.get('outputs', [])) + [n for n, v in src_vars.items() if v.causality == 'parameter']
+                names = [n for n in dict.fromkeys(names) if n in src_vars and n in dst_vars and dst_vars[n].settable]
+                pairs = [(src_vars[n], dst_vars[n]) for n in names]
+            plans[(source, target)] = HandOver(source, target, pairs)
+    return plans
@@ -0,0 +1,33 @@
+from typing import Callable, Iterable, Mapping
+
+from .expressions import Condition
+
+class StopConditionView:
+    """
+    Values a stop condition sees during one mode. Parameters are bound once at mode entry;
+    each step only overwrites the monitored slots in place, so the per-step cost does not
+    depend on how many parameters the FMU has.
+    """
+
+    def __init__(self, condition: Callable, params: Mapping[str, float], monitored: Iterable[str]):
+        self.monitored = list(monitored)
+        if isinstance(condition, Condition):
+            # Positional buffer laid out like the condition's variables
+            layout = list(condition.variables)
+            self.values = [params.get(var) for var in layout]
+            self.slots = [layout.index(var) for var in self.monitored]
+            self._check = condition.bind(layout)
+        else:
+            # Lambdas get one mapping per mode with parameters pre-filled
+            self.values = dict(params)
+            self.slots = list(self.monitored)
+            self._check = condition
+
+    def update(self, values: Iterable[float]):
+        """Stores the latest monitored values, ordered like `monitored`"""
+        current = self.values
+        for slot, val in zip(self.slots, values):
+            current[slot] = val
+
+    def check(self) -> bool:
+        return self._check(self.values)
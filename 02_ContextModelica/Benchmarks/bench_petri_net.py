@@ -0,0 +1,191 @@
+"""
+Build time and per-step firing cost of context Petri nets of growing size.
+
+Nets come from synthetic_context_cfg(): contexts with random threshold guards on a few globals,
+exclusion groups, requirement chains and weak/strong inclusions, scaled with the number of
+contexts. Every net is built and fired with each implementation in PETRI_NETS ('snakes' is the
+SNAKES binding search, 'compiled' the CompiledContextNet) on the same random walk of the globals.
+Both implementations must end every step with the same marking.
+
+The crossover columns show where the cheaper firing of one implementation outweighs its higher
+build cost: the number of steps after which it is faster in total.
+
+Usage: python bench_petri_net.py [--sizes N ...] [--steps N] [--seed N] [--json out.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from snakes import ConstraintError
+
+from ContextModelica import PETRI_NETS
+
+SIZES = [5, 10, 20, 50, 100, 200]
+
+def synthetic_context_cfg(places, globals_count=None, exclusion_groups=None, group_size=3,
+                          requirement_chains=None, chain_length=3, weak_inclusions=None,
+                          strong_inclusions=None, initially_active=0.1, seed=0):
+    """
+    A random context_cfg with `places` contexts. Each context is activated when one global rises
+    above a random threshold and deactivated when it falls below a lower one. Every relation kind
+    is drawn from its own contexts, since a context that is both excluded from and required by
+    another (or a pair that is both a requirement and an inclusion) gives an unbuildable net;
+    omitted counts scale with the number of contexts.
+    """
+    rng = random.Random(seed)
+    names = [f'C{i}' for i in range(places)]
+    globals_count = globals_count or max(2, places // 5)
+    variables = [f'g{i}' for i in range(globals_count)]
+
+    guards = {}
+    for name in names:
+        var = rng.choice(variables)
+        high = rng.uniform(0.3, 1.0)
+        low = rng.uniform(0.0, high)
+        guards[f'Activate_{name}'] = f'{var} > {high:.3f}'
+        guards[f'Deactivate_{name}'] = f'{var} < {low:.3f}'
+
+    pool = names[:]
+    rng.shuffle(pool)
+
+    def draw(count, size):
+        """Takes up to `count` groups of `size` contexts no other relation uses"""
+        count = min(count, len(pool) // size)
+        groups = [pool[i * size:(i + 1) * size] for i in range(count)]
+        del pool[:count * size]
+        return groups
+
+    exclusion = draw(places // 10 if exclusion_groups is None else exclusion_groups, group_size)
+    requirements = []
+    for chain in draw(places // 20 if requirement_chains is None else requirement_chains, chain_length):
+        requirements.extend(zip(chain[:-1], chain[1:]))  # Each context requires the next one
+    weak = [tuple(pair) for pair in draw(places // 10 if weak_inclusions is None else weak_inclusions, 2)]
+    strong = [tuple(pair) for pair in draw(places // 10 if strong_inclusions is None else strong_inclusions, 2)]
+
+    excluded = {name for group in exclusion for name in group[1:]}
+    initial = {name: int(name not in excluded and rng.random() < initially_active) for name in names}
+    return {
+        'places': {name: {'initial': initial[name]} for name in names},
+        'globals': variables,
+        'guards': guards,
+        'relations': {'exclusion': exclusion, 'requirements': requirements,
+                      'weak_inclusions': weak, 'strong_inclusions': strong},
+    }
+
+def random_walk(variables, steps, seed=0):
+    """Values of the globals per step, moving in [0, 1] so guards keep switching"""
+    rng = random.Random(seed)
+    values = {var: rng.random() for var in variables}
+    walk = []
+    for _ in range(steps):
+        for var in variables:
+            values[var] = min(1.0, max(0.0, values[var] + rng.gauss(0, 0.05)))
+        walk.append(dict(values))
+    return walk
+
+def _marking(net):
+    return tuple(len(p.tokens) for p in net.net.place())
+
+def bench_net(cfg, walk, builds=3):
+    """Build time and firing cost per implementation; markings are compared after every step"""
+    results = {}
+    markings = {}
+    for name, cls in PETRI_NETS.items():
+        build_times = []
+        for _ in range(builds):
+            start = time.perf_counter()
+            try:
+                net = cls(cfg)
+            except ConstraintError as e:
+                raise ValueError(f"{name} cannot build the net of {len(cfg['places'])} contexts: {e}") from None
+            build_times.append(time.perf_counter() - start)
+
+        trace = []
+        elapsed = 0.0
+        for values in walk:
+            net.globals.update(values)
+            start = time.perf_counter()
+            net.fire()
+            elapsed += time.perf_counter() - start
+            trace.append(_marking(net))
+        markings[name] = trace
+        results[name] = {'build_ms': statistics.median(build_times) * 1e3,
+                         'fire_us': elapsed / len(walk) * 1e6,
+                         'switches': sum(a != b for a, b in zip(trace, trace[1:]))}
+
+    reference = next(iter(markings.values()))
+    results['consistent'] = all(trace == reference for trace in markings.values())
+    return results
+
+def crossover_steps(a, b):
+    """Steps after which implementation b is faster in total than a; None if never, 0 if always"""
+    build_diff = b['build_ms'] * 1e3 - a['build_ms'] * 1e3  # us
+    fire_gain = a['fire_us'] - b['fire_us']
+    if fire_gain <= 0:
+        return None if build_diff >= 0 else 0
+    return max(0, int(build_diff / fire_gain) + 1)
+
+def collect(sizes, steps, seed):
+    rows = []
+    for size in sizes:
+        cfg = synthetic_context_cfg(size, seed=seed)
+        walk = random_walk(cfg['globals'], steps, seed=seed)
+        result = bench_net(cfg, walk)
+        relations = cfg['relations']
+        rows.append({
+            'places': size,
+            'transitions': len(PETRI_NETS['snakes'](cfg).net.transition()),
+            'relations': {key: len(value) for key, value in relations.items()},
+            'consistent': result.pop('consistent'),
+            'engines': result,
+            'crossover_steps': crossover_steps(result['snakes'], result['compiled']),
+        })
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--steps', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="Write the results to this file")
+    args = parser.parse_args(argv)
+
+    try:
+        rows = collect(args.sizes, args.steps, args.seed)
+    except ValueError as e:
+        sys.exit(f"Unbuildable context config (seed {args.seed}): {e}")
+    engines = list(PETRI_NETS)
+    header = f"{'places':>7}{'transitions':>13}" + ''.join(f"{e + ' build [ms]':>22}{e + ' fire [us]':>21}" for e in engines)
+    print(header + f"{'crossover [steps]':>19}")
+    for row in rows:
+        line = f"{row['places']:>7}{row['transitions']:>13}"
+        for e in engines:
+            line += f"{row['engines'][e]['build_ms']:>22.2f}{row['engines'][e]['fire_us']:>21.1f}"
+        crossover = row['crossover_steps']
+        line += f"{'never' if crossover is None else crossover:>19}"
+        if not row['consistent']:
+            line += "  MARKINGS DIFFER"
+        print(line)
+
+    faster = [row['places'] for row in rows if row['engines']['compiled']['fire_us'] < row['engines']['snakes']['fire_us']]
+    if faster:
+        print(f"\ncompiled fires faster from {min(faster)} places on")
+
+    if args.json:
+        machine = {'python': platform.python_version(), 'machine': platform.machine(),
+                   'processor': platform.processor(), 'system': platform.platform(), 'cpus': os.cpu_count()}
+        with open(args.json, 'w') as f:
+            json.dump({'machine': machine, 'steps': args.steps, 'seed': args.seed, 'results': rows}, f, indent=2)
+
+    if not all(row['consistent'] for row in rows):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,20 @@
 import shutil
+import sys
 import matplotlib.pyplot as plt
 import re
 from collections import defaultdict
 from itertools import permutations
+from pathlib import Path
 from snakes.nets import PetriNet, Place, Transition, Expression, Inhibitor, Value
-from fmpy import read_model_description, extract
-from fmpy.fmi3 import FMU3Slave
+
+# Runtime support shared with FMUVSS
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / '01_FMUVSS'))
+from VSSRuntime.expressions import as_condition
+from VSSRuntime.memory import MemoryMonitor, log_bytes
+from VSSRuntime.mockfmu import MockFMU3, is_mock, read_mock_description
+from VSSRuntime.profiler import PROFILERS, SamplingProfiler
+from VSSRuntime.timers import CONDITION, FIRE, INITIALIZE, LOAD, LOG, READ, STEP, TRANSITION, PhaseTimers
+from VSSRuntime.trace import TraceRecorder
 
 # ============================
 # === 1) User Configuration
@@ -31,13 +40,13 @@ sim_cfg = {
             'fmu':       'xxx.fmu',
             'outputs':   [],
             'parameters': {},
-            'stop_condition': lambda g: g['xxx'] < g['xxx']
+            'stop_condition': 'xxx < xxx'  # expression string or lambda g: ...
         },
         'yyy': {
             'fmu':       'yyy.fmu',
             'outputs':   [],
             'parameters': {},
-            'stop_condition': lambda g: g['yyy'] >= g['yyy']
+            'stop_condition': 'yyy >= yyy'
         }
     },
 
@@ -270,37 +279,205 @@ class ContextPetriNet:
         if iteration >= max_iterations:
             print(f"Warning: fire() reached maximum iterations ({max_iterations})")
 
+class CompiledContextNet(ContextPetriNet):
+    """
+    ContextPetriNet with the same net and markings, fired without SNAKES' binding search: every
+    transition is compiled once into its input places, inhibitor places, output places and guard
+    code, so a step costs a few token lookups and guard evaluations per transition.
+    """
+    def __init__(self, cfg):
+        super().__init__(cfg)
+        self._env = {'__globals__': self.globals}
+        self._compiled = []
+        for t in self.net.transition():
+            inputs = [p for p, arc in t.input() if not isinstance(arc, Inhibitor)]
+            inhibitors = [p for p, arc in t.input() if isinstance(arc, Inhibitor)]
+            outputs = [p for p, _ in t.output()]
+            guard = compile(str(t.guard), f'<guard {t.name}>', 'eval')
+            self._compiled.append((inputs, inhibitors, outputs, guard))
+
+    def fire(self):
+        env = self._env
+        env['__globals__'] = self.globals  # Follows a replaced globals dict
+        fired_any = True
+        iteration = 0
+        max_iterations = 10
+
+        while fired_any and iteration < max_iterations:
+            fired_any = False
+            iteration += 1
+
+            for inputs, inhibitors, outputs, guard in self._compiled:
+                if not all(1 in p.tokens for p in inputs) or any(1 in p.tokens for p in inhibitors):
+                    continue
+                try:
+                    if not eval(guard, env):
+                        continue
+                except Exception:
+                    continue
+                for p in inputs:
+                    p.remove([1])
+                for p in outputs:
+                    p.add([1])
+                fired_any = True
+                break
+
+        if iteration >= max_iterations:
+            print(f"Warning: fire() reached maximum iterations ({max_iterations})")
+
+# Petri net implementations selectable with SimulationEngine(petri_net=...)
+PETRI_NETS = {'snakes': ContextPetriNet, 'compiled': CompiledContextNet}
+
 # ============================
 # === 3) FMU Wrapper
 # ============================
+def _fmpy():
+    """fmpy and fmpy.fmi3, imported on first use so that mock runs do not need them"""
+    try:
+        import fmpy  # type: ignore
+        import fmpy.fmi3  # type: ignore
+    except ImportError as e:
+        raise ImportError("Loading FMI 3.0 FMUs requires FMPy (pip install fmpy)") from e
+    return fmpy, fmpy.fmi3
+
+class FMUCache:
+    """Keeps one extraction per FMU path so repeated mode entries skip unzipping"""
+    def __init__(self):
+        self._entries = {}
+
+    def get(self, fmu_path):
+        if fmu_path not in self._entries:
+            if is_mock(fmu_path):
+                self._entries[fmu_path] = (read_mock_description(fmu_path), None)
+            else:
+                fmpy, _ = _fmpy()
+                self._entries[fmu_path] = (fmpy.read_model_description(fmu_path), fmpy.extract(fmu_path))
+        return self._entries[fmu_path]
+
+    def directories(self):
+        return [unzip for _, unzip in self._entries.values() if unzip is not None]
+
+    def cleanup(self):
+        for _, unzip in self._entries.values():
+            if unzip is not None:
+                shutil.rmtree(unzip, ignore_errors=True)
+        self._entries.clear()
+
 class FMUInstance:
-    def __init__(self, fmu_path, name):
-        md = read_model_description(fmu_path)
-        unzip = extract(fmu_path)
-        self.fmu = FMU3Slave(
-            guid=md.guid,
-            unzipDirectory=unzip,
-            modelIdentifier=md.coSimulation.modelIdentifier,
-            instanceName=name
-        )
+    def __init__(self, fmu_path, name, cache=None):
+        if cache is not None:
+            md, unzip = cache.get(fmu_path)
+        elif is_mock(fmu_path):
+            md, unzip = read_mock_description(fmu_path), None
+        else:
+            fmpy, _ = _fmpy()
+            md, unzip = fmpy.read_model_description(fmu_path), fmpy.extract(fmu_path)
+        if is_mock(fmu_path):
+            self.fmu = MockFMU3(fmu_path, instanceName=name)
+        else:
+            self.fmu = _fmpy()[1].FMU3Slave(
+                guid=md.guid,
+                unzipDirectory=unzip,
+                modelIdentifier=md.coSimulation.modelIdentifier,
+                instanceName=name
+            )
         self.refs = {v.name: v.valueReference for v in md.modelVariables}
+        self.types = {v.name: v.type for v in md.modelVariables}
         self._unzip = unzip
+        self._owns_unzip = cache is None
         self.md = md
+        self.terminated = False
+
+    def write_params(self, rules, petri):
+        """
+        Set parameter values before initialization.
+        A rule is either a plain value or a dict of context -> value with an optional 'default'.
+        """
+        for pname, rule in rules.items():
+            if pname not in self.refs:
+                raise ValueError(f"Parameter '{pname}' not found in {self.md.modelName}")
+            val = rule
+            if isinstance(rule, dict):
+                val = rule.get('default')
+                for place, v in rule.items():
+                    if place != 'default' and petri.net.place(place).tokens:
+                        val = v
+                        break
+            if val is None:
+                continue
+            vtype = self.types[pname]
+            if vtype == 'Boolean':
+                self.fmu.setBoolean([self.refs[pname]], [bool(val)])
+            elif vtype == 'Enumeration':
+                self.fmu.setInt64([self.refs[pname]], [int(val)])
+            elif 'Int' in vtype:
+                getattr(self.fmu, f"set{vtype}")([self.refs[pname]], [int(val)])
+            else:
+                self.fmu.setFloat64([self.refs[pname]], [float(val)])
+
+    def terminate(self):
+        if not self.terminated:
+            self.fmu.terminate()
+            self.terminated = True
+
+    def reset(self):
+        """Returns a terminated instance to its freshly instantiated state for the next mode entry"""
+        self.fmu.reset()
+        self.terminated = False
+
+    def release(self):
+        try:
+            self.terminate()
+        finally:
+            self.fmu.freeInstance()
+            if self._owns_unzip and self._unzip is not None:
+                shutil.rmtree(self._unzip)
 
 # ============================
 # === 4) Simulation Engine
 # ============================
 class SimulationEngine:
-    def __init__(self, context_cfg, sim_cfg, plot_cfg):
-        self.petri = ContextPetriNet(context_cfg)
+    def __init__(self, context_cfg, sim_cfg, plot_cfg, verbose=True, fmu_cache=None, petri_net='snakes',
+                 timers=False, trace=None, profile=None, profile_path='profile.folded',
+                 memory=False, sink=None):
+        if petri_net not in PETRI_NETS:
+            raise ValueError(f"Unknown petri_net '{petri_net}', expected one of {sorted(PETRI_NETS)}")
+        self.petri = PETRI_NETS[petri_net](context_cfg)
         self.config = sim_cfg
         self.config['plot_cfg'] = plot_cfg
         self.time = sim_cfg['initial_time']
-        self.logs = defaultdict(list)
+        # Optional result sink (e.g. VSSRuntime.hdf5.HDF5Sink) the logs are streamed to in chunks.
+        self.sink = sink
+        self.logs = sink.logs() if sink else defaultdict(list)
         self.prev_vals = {}
-
-    def run(self):
-        print(f"Starting simulation: t={self.time}s to t={self.config['stop_time']}s")
+        self.verbose = verbose
+        self.fmu_cache = fmu_cache  # Optional FMUCache shared across runs
+        self.error = None  # Exception that ended the run early, if any
+        self.instances = {}  # FMU path -> FMUInstance, shared by all modes using that FMU
+        # Opt-in wall time and call counts per mode and loop phase; None keeps the loop untimed.
+        self.timers = PhaseTimers() if timers else None
+        # Opt-in Chrome trace of modes, context activations and FMU calls, written to the path `trace` after run().
+        self.trace_path = trace
+        self.trace = TraceRecorder('ContextModelica') if trace else None
+        self.context_places = list(context_cfg['places'])  # Traced contexts; the net adds helper places
+        # profile='sampling' samples the stack per mode and writes folded stacks to profile_path after run().
+        if profile is not None and profile not in PROFILERS:
+            raise ValueError(f"Unknown profile '{profile}', expected one of {list(PROFILERS)}")
+        self.profile_path = profile_path
+        self.profiler = SamplingProfiler() if profile == 'sampling' else None
+        # memory=True samples memory at mode switches; a MemoryMonitor can also enforce a budget.
+        self.memory = MemoryMonitor() if memory is True else (memory or None)
+        if self.memory and self.memory.on_budget == 'spill':
+            raise ValueError("SimulationEngine keeps its logs in memory and cannot spill them; use on_budget='abort'")
+        # Expression strings are compiled once; lambdas are kept as they are.
+        self.conditions = {m: as_condition(c['stop_condition']) for m, c in sim_cfg['modes'].items()}
+
+    def _info(self, msg):
+        if self.verbose:
+            print(msg)
+
+    def run(self, plot=True):
+        self._info(f"Starting simulation: t={self.time}s to t={self.config['stop_time']}s")
         iteration = 0
         current_logged_mode = None
 
@@ -310,12 +487,25 @@ class SimulationEngine:
         last_globals_snapshot = dict(self.petri.globals)
         last_token_snapshot = {p.name: bool(p.tokens) for p in self.petri.net.place()}
         stuck_counter = 0
+        trace = self.trace
+        if trace:
+            trace.contexts({p: last_token_snapshot[p] for p in self.context_places}, self.time)
+        if self.profiler:
+            self.profiler.start()
+        memory = self.memory
+        over_budget = False
+        if memory:
+            memory.start()
+        if self.sink:
+            self.sink.set_metadata(engine='ContextModelica',
+                                   simulation={k: v for k, v in self.config.items() if k != 'plot_cfg'},
+                                   places=[p.name for p in self.petri.net.place()])
 
         try:
             while self.time < self.config['stop_time']:
                 iteration += 1
                 if iteration > MAX_ITER:
-                    print(f"Aborting: reached MAX_ITER = {MAX_ITER}")
+                    self._info(f"Aborting: reached MAX_ITER = {MAX_ITER}")
                     break
 
                 # Determine the current mode
@@ -323,24 +513,34 @@ class SimulationEngine:
                             if p.tokens and p.name in self.config['modes']), None)
 
                 if not mode:
-                    print("No active mode found. Simulation complete.")
+                    self._info("No active mode found. Simulation complete.")
                     break
 
                 # Mode change logging
                 if mode != current_logged_mode:
-                    print(f"[{iteration}] Mode switched to: {mode} at t={self.time:.1f}s")
+                    self._info(f"[{iteration}] Mode switched to: {mode} at t={self.time:.1f}s")
                     self.logs['mode'].append((self.time, mode))
+                    if self.sink:
+                        self.sink.switch(self.time, mode)
                     current_logged_mode = mode
 
                 cfg = self.config['modes'][mode]
+                laps = self.timers.mode(mode) if self.timers else None
+                if self.profiler:
+                    self.profiler.mode = mode
+                if laps:
+                    laps.start()
 
                 # Check stop_condition before creating FMU
-                cond = cfg['stop_condition']
+                cond = self.conditions[mode]
+                cond = getattr(cond, 'by_name', cond)  # Skip the wrapper call in the step loop
                 try:
                     cond_now = bool(cond(self.petri.globals))
                 except Exception as e:
                     print(f"Error evaluating stop_condition for mode {mode}: {e}")
                     cond_now = False
+                if laps:
+                    laps.lap(CONDITION)
 
                 if cond_now:
                     # Mode should end immediately - save values and fire Petri net
@@ -357,17 +557,41 @@ class SimulationEngine:
                             raise RuntimeError(f"Stuck trying to exit mode '{mode}' at t={self.time}: no token changes.")
                     else:
                         stuck_counter = 0
+                    if laps:
+                        laps.lap(FIRE)
+                    if trace:
+                        trace.contexts({p: new_tokens[p] for p in self.context_places}, self.time)
                     continue
 
                 # Create and initialize FMU
+                if trace:
+                    trace.begin_mode(mode, self.time)
                 fmu = None
                 try:
-                    fmu = FMUInstance(cfg['fmu'], mode)
-                    fmu.fmu.instantiate()
+                    # Modes on the same FMU (e.g. deduplicated ModeGen submodels) share one instance
+                    fmu = self.instances.get(cfg['fmu'])
+                    if fmu is None:
+                        fmu = FMUInstance(cfg['fmu'], mode, cache=self.fmu_cache)
+                        if laps:
+                            laps.lap(LOAD)
+                        if trace:
+                            trace.lap('load')
+                        fmu.fmu.instantiate()
+                        self.instances[cfg['fmu']] = fmu
+                        if trace:
+                            trace.lap('instantiate')
+                    else:
+                        fmu.reset()
+                        if trace:
+                            trace.lap('reset')
+                    fmu.write_params(cfg.get('parameters', {}), self.petri)
+                    # Rules with per-context values are re-applied whenever the marking changes
+                    context_rules = {name: rule for name, rule in cfg.get('parameters', {}).items()
+                                     if isinstance(rule, dict) and set(rule) - {'default'}}
 
                     # Set initial values from previous mode (before initialization)
                     if self.prev_vals:
-                        print(f"  Restoring {len(self.prev_vals)} variable(s) from previous mode")
+                        self._info(f"  Restoring {len(self.prev_vals)} variable(s) from previous mode")
                         for var in cfg.get('outputs', []):
                             if var in self.prev_vals and var in fmu.refs:
                                 fmu.fmu.setFloat64([fmu.refs[var]], [self.prev_vals[var]])
@@ -378,11 +602,21 @@ class SimulationEngine:
                         stopTime=self.config['stop_time']
                     )
                     fmu.fmu.exitInitializationMode()
+                    if laps:
+                        laps.lap(INITIALIZE)
+                    if trace:
+                        trace.lap('initialize')
+                    if memory:
+                        memory.switch(mode, self.time, log_bytes(self.logs, per_mode=False),
+                                      fmus=len(self.instances), dirs=self._extract_dirs())
+                        over_budget = memory.check()
 
                     # Simulation loop
                     inner_iter = 0
-                    while self.time < self.config['stop_time'] and not cond(self.petri.globals):
+                    while not over_budget and self.time < self.config['stop_time'] and not cond(self.petri.globals):
                         inner_iter += 1
+                        if laps:
+                            laps.lap(CONDITION)
 
                         # Execute simulation step
                         step = self.config['step_size']
@@ -394,24 +628,35 @@ class SimulationEngine:
                             communicationStepSize=step,
                             noSetFMUStatePriorToCurrentPoint=False
                         )
-                        
+                        if laps:
+                            laps.lap(STEP)
+
                         # Read and log outputs
                         vals = fmu.fmu.getFloat64([fmu.refs[n] for n in cfg.get('outputs', [])])
+                        if laps:
+                            laps.lap(READ)
                         for n, v in zip(cfg.get('outputs', []), vals):
                             self.petri.globals[n] = v
                             self.logs[n].append((self.time, v))
+                        if trace:
+                            trace.sample(cfg.get('outputs', []), vals)
 
                         # Periodic progress logging
-                        if inner_iter % 100 == 0:
+                        if self.verbose and inner_iter % 100 == 0:
                             status = ', '.join([f"{k}={v:.4f}" for k, v in self.petri.globals.items()])
                             print(f"  [t={self.time:.1f}s] {status}")
 
                         # Log context states and fire Petri net transitions
                         self._log_context_states()
+                        if laps:
+                            laps.lap(LOG)
                         prev_tokens = {p.name: bool(p.tokens) for p in self.petri.net.place()}
                         self.petri.fire()
                         new_tokens = {p.name: bool(p.tokens) for p in self.petri.net.place()}
 
+                        if context_rules and new_tokens != prev_tokens:
+                            fmu.write_params(context_rules, self.petri)
+
                         # Advance time
                         prev_time = self.time
                         self.time += step
@@ -429,35 +674,84 @@ class SimulationEngine:
                             stuck_counter += 1
                             if stuck_counter >= STUCK_LIMIT:
                                 raise RuntimeError(f"Simulation appears stuck at t={self.time}: no changes detected.")
+                        if laps:
+                            laps.lap(FIRE)
+                        if trace:
+                            trace.contexts({p: new_tokens[p] for p in self.context_places}, self.time)
+                        if memory and memory.due() and memory.check():
+                            over_budget = True
+                            break
+                    if trace:
+                        trace.lap('steps', steps=inner_iter)
 
                     # Save values on normal exit from mode
                     for var in cfg.get('outputs', []):
                         self.prev_vals[var] = self.petri.globals.get(var)
 
                 except Exception as e:
+                    self.error = e
                     print(f"Error in mode {mode}: {e}")
                     import traceback
                     traceback.print_exc()
                     break
                 finally:
-                    # Cleanup FMU resources
+                    # Terminate the FMU; the instance is kept for the next entry of a mode using it
                     if fmu is not None:
                         try:
-                            fmu.fmu.terminate()
-                            fmu.fmu.freeInstance()
-                            shutil.rmtree(fmu._unzip)
+                            fmu.terminate()
                         except Exception as e:
                             print(f"Error terminating FMU: {e}")
+                    if laps:
+                        laps.lap(TRANSITION)
+                    if trace:
+                        trace.lap('terminate')
+                        trace.end_mode(self.time)
+
+                if over_budget:
+                    self._info(f"Memory budget of {memory.budget_mb} MB exceeded at t={self.time:.1f}s, stopping")
+                    break
 
         except KeyboardInterrupt:
             print("\nSimulation interrupted by user")
         except Exception as e:
+            self.error = e
             print(f"Simulation error: {e}")
             import traceback
             traceback.print_exc()
         finally:
-            print(f"Simulation finished at t={self.time/3600:.2f}h")
-            self._plot()
+            for fmu in self.instances.values():
+                try:
+                    fmu.release()
+                except Exception as e:
+                    print(f"Error releasing FMU: {e}")
+            self.instances.clear()
+            self._info(f"Simulation finished at t={self.time/3600:.2f}h")
+            if self.sink:
+                self.logs.flush()
+                self.sink.flush()
+            if memory:
+                memory.switch(None, self.time, log_bytes(self.logs), dirs=self._extract_dirs())
+                memory.stop()
+                self._info(memory.report())
+            if self.timers:
+                self._info(self.timers.report())
+            if trace:
+                trace.close(self.time)
+                trace.write(self.trace_path)
+                self._info(f"Trace written to {self.trace_path}")
+            if self.profiler:
+                self.profiler.stop()
+                self.profiler.write(self.profile_path)
+                self._info(f"Profile written to {self.profile_path}")
+            if plot:
+                self._plot()
+
+    def _extract_dirs(self):
+        """Extraction directories of the live FMU instances and the shared cache"""
+        dirs = {fmu._unzip for fmu in self.instances.values()}
+        if self.fmu_cache is not None:
+            dirs.update(self.fmu_cache.directories())
+        return [d for d in dirs if d is not None]
 
     def _log_context_states(self):
         """Log token state (1 or 0) of all context places, including aggregated states."""
@@ -0,0 +1,178 @@
+# ==========================================
+# ContextModelica Scenario Batch Runner
+# ==========================================
+#
+# Runs one case study against many scenarios in parallel worker processes.
+#
+#   python ContextModelica_Batch.py CaseStudies/ITSystem/ContextModelica_ITSystem.py scenarios.json --out results
+#
+# The case study script only provides `context_cfg`, `sim_cfg` and `plot_cfg`;
+# every scenario is simulated with the SimulationEngine from ContextModelica.py,
+# not with an engine the script defines itself. That engine sets `parameters`
+# at mode entry and re-applies rules with per-context values whenever the
+# marking changes; outputs are handed to the next mode before its
+# initialization. Scripts with their own engine (e.g. the ITSystem and
+# EnergySystem case studies) get a warning, since their engine may differ.
+# A scenario is a dict of overrides, all keys optional:
+#
+#   {
+#       'name': 'peak_load',
+#       'initial_marking': {'greenSupply': 0, 'hybridSupply': 1},
+#       'parameters': {'loadTable.table[15,2]': 260.0},                 # every mode
+#       'mode_parameters': {'greenSupply': {'corePowerFactor': 12.0}},  # single mode
+#       'stop_time': 43200.0,
+#       'step_size': 5.0
+#   }
+
+import argparse
+import ast
+import copy
+import json
+import os
+import runpy
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import util
+from pathlib import Path
+
+import numpy as np
+
+from ContextModelica import FMUCache, SimulationEngine
+
+# Per-process state, populated by _init_worker
+_case_study = None
+_fmu_cache = None
+
+def load_case_study(script):
+    """Returns (context_cfg, sim_cfg, plot_cfg) from a case study script, with FMU paths made absolute."""
+    script = Path(script).resolve()
+    ns = runpy.run_path(str(script))
+    sim_cfg = ns['sim_cfg']
+    for mode_cfg in sim_cfg['modes'].values():
+        mode_cfg['fmu'] = str((script.parent / mode_cfg['fmu']).resolve())
+    return ns['context_cfg'], sim_cfg, ns.get('plot_cfg', {})
+
+def defines_engine(script):
+    """True if a case study script defines its own SimulationEngine class."""
+    tree = ast.parse(Path(script).read_text())
+    return any(isinstance(node, ast.ClassDef) and node.name == 'SimulationEngine' for node in tree.body)
+
+def apply_scenario(context_cfg, sim_cfg, scenario):
+    """Returns deep copies of the configurations with the scenario overrides applied."""
+    context_cfg = copy.deepcopy(context_cfg)
+    sim_cfg = copy.deepcopy(sim_cfg)
+
+    for place, marking in scenario.get('initial_marking', {}).items():
+        if place not in context_cfg['places']:
+            raise ValueError(f"Unknown context '{place}' in initial_marking")
+        context_cfg['places'][place]['initial'] = marking
+
+    for mode_cfg in sim_cfg['modes'].values():
+        mode_cfg['parameters'] = {**mode_cfg.get('parameters', {}), **scenario.get('parameters', {})}
+    for mode, params in scenario.get('mode_parameters', {}).items():
+        if mode not in sim_cfg['modes']:
+            raise ValueError(f"Unknown mode '{mode}' in mode_parameters")
+        sim_cfg['modes'][mode]['parameters'].update(params)
+
+    for key in ('initial_time', 'stop_time', 'step_size'):
+        if key in scenario:
+            sim_cfg[key] = scenario[key]
+    return context_cfg, sim_cfg
+
+def columnar_logs(logs):
+    """Converts engine logs of (time, value) tuples into columnar numpy arrays."""
+    series = {}
+    for key, entries in logs.items():
+        if key == 'mode':
+            continue
+        times = np.fromiter((t for t, _ in entries), dtype=float, count=len(entries))
+        values = np.fromiter((v for _, v in entries), dtype=float, count=len(entries))
+        series[key] = (times, values)
+    return series
+
+def _init_worker(script):
+    global _case_study, _fmu_cache
+    _case_study = load_case_study(script)
+    # Each worker extracts every FMU once and removes the extractions when it exits
+    _fmu_cache = FMUCache()
+    util.Finalize(_fmu_cache, _fmu_cache.cleanup, exitpriority=10)
+
+def _run_scenario(index, scenario):
+    context_cfg, sim_cfg = apply_scenario(_case_study[0], _case_study[1], scenario)
+    engine = SimulationEngine(context_cfg, sim_cfg, _case_study[2], verbose=False, fmu_cache=_fmu_cache)
+
+    start = time.perf_counter()
+    engine.run(plot=False)
+    wall_time = time.perf_counter() - start
+
+    return {
+        'index': index,
+        'name': scenario.get('name', f'scenario_{index}'),
+        'final_time': engine.time,
+        'wall_time': wall_time,
+        'error': repr(engine.error) if engine.error is not None else None,
+        'mode_switches': list(engine.logs.get('mode', [])),
+        'series': columnar_logs(engine.logs),
+    }
+
+def iter_batch(script, scenarios, workers=None):
+    """Runs all scenarios of a case study and yields each result as soon as its worker finishes."""
+    workers = workers or os.cpu_count()
+    if defines_engine(script):
+        warnings.warn(f"{Path(script).name} defines its own SimulationEngine; its scenarios are run "
+                      f"with the SimulationEngine from ContextModelica.py", stacklevel=2)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(str(script),)) as pool:
+        futures = [pool.submit(_run_scenario, i, sc) for i, sc in enumerate(scenarios)]
+        for future in as_completed(futures):
+            yield future.result()
+
+def run_batch(script, scenarios, workers=None):
+    """Runs all scenarios of a case study and returns the results in scenario order."""
+    results = sorted(iter_batch(script, scenarios, workers), key=lambda r: r['index'])
+    return results
+
+def save_result(result, out_dir):
+    """Writes one scenario result as <index>_<name>.npz, one time and value array per logged variable."""
+    arrays = {}
+    for key, (times, values) in result['series'].items():
+        arrays[f'{key}/time'] = times
+        arrays[f'{key}/value'] = values
+    path = Path(out_dir) / f"{result['index']:04d}_{result['name']}.npz"
+    np.savez(path, **arrays)
+    return path
+
+# ============================
+# === Command Line Interface
+# ============================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a ContextModelica case study over a list of scenarios")
+    parser.add_argument('case_study', type=Path, help="case study script defining context_cfg and sim_cfg")
+    parser.add_argument('scenarios', type=Path, help="JSON file with a list of scenario overrides")
+    parser.add_argument('--out', type=Path, default=Path('batch_results'), help="output directory")
+    parser.add_argument('--workers', type=int, default=None, help="number of worker processes")
+    args = parser.parse_args(argv)
+
+    with open(args.scenarios) as f:
+        scenarios = json.load(f)
+    args.out.mkdir(parents=True, exist_ok=True)
+
+    summary = []
+    failed = 0
+    for result in iter_batch(args.case_study, scenarios, args.workers):
+        path = save_result(result, args.out)
+        status = 'FAIL' if result['error'] else 'OK'
+        failed += bool(result['error'])
+        print(f"[{status}] {result['name']}: t_end={result['final_time']:.1f}s, "
+              f"{len(result['mode_switches'])} mode switch(es), {result['wall_time']:.2f}s -> {path.name}")
+        summary.append({k: result[k] for k in ('index', 'name', 'final_time', 'wall_time', 'error', 'mode_switches')})
+
+    summary.sort(key=lambda r: r['index'])
+    with open(args.out / 'summary.json', 'w') as f:
+        json.dump(summary, f, indent=2)
+    print(f"{len(summary) - failed}/{len(summary)} scenarios completed, summary written to {args.out / 'summary.json'}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
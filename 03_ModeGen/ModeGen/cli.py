@@ -1,50 +1,364 @@
+import glob
+import importlib.util
+import json
+import os
+import sys
+import time
 import click
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
 from .parser import ModelicaAnnotationParser
 from .generator import ModelicaGenerator
-from .model_checker import ModelChecker
+from .pruner import DeclarationPruner
+from .fmu_builder import FMUBuilder
+from .model_checker import CheckCache, ModelChecker, SessionChecker
+
+def _make_checker(session: bool, jobs: int, omc: str) -> ModelChecker:
+    """Session-based checker if OMPython is available, otherwise one omc process per submodel"""
+    if session and importlib.util.find_spec("OMPython") is not None:
+        return SessionChecker(sessions=jobs)
+    return ModelChecker(omc_path=omc)
+
+def _is_sum(path: Path, max_lines: int = 200) -> bool:
+    """True if the file's header names modes in MODEL-METADATA"""
+    try:
+        with open(path, 'r') as f:
+            for _, line in zip(range(max_lines), f):
+                if ModelicaAnnotationParser.MODES_START.search(line):
+                    return True
+    except (OSError, UnicodeDecodeError):
+        pass
+    return False
+
+def _collect(model_files: tuple, known: Optional[Dict[Path, Tuple[Tuple[int, int], bool]]] = None) -> List[Path]:
+    """
+    Expands the arguments into SUM files: files are taken as given, directories are searched
+    recursively (skipping generated/) and glob patterns are expanded; from directories and
+    globs only .mo files with a 'Modes' metadata list are kept. `known` caches that decision
+    per file with its modification time and size, so repeated calls only read changed files.
+    """
+    files = {}
+    for argument in model_files:
+        path = Path(argument)
+        if path.is_file():
+            files.setdefault(path.resolve(), path)
+            continue
+        if path.is_dir():
+            candidates = [p for p in sorted(path.rglob("*.mo")) if "generated" not in p.relative_to(path).parts]
+        elif any(char in argument for char in "*?["):
+            candidates = [Path(p) for p in sorted(glob.glob(argument, recursive=True)) if p.endswith(".mo")]
+        else:
+            raise click.BadParameter(f"'{argument}' is neither a file, a directory nor a matching pattern",
+                                     param_hint="MODEL_FILES")
+        for candidate in candidates:
+            if candidate.is_file() and _is_sum_cached(candidate, known):
+                files.setdefault(candidate.resolve(), candidate)
+    return list(files.values())
+
+def _is_sum_cached(path: Path, known: Optional[Dict[Path, Tuple[Tuple[int, int], bool]]]) -> bool:
+    if known is None:
+        return _is_sum(path)
+    try:
+        stat = path.stat()
+    except OSError:
+        return False
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    entry = known.get(path)
+    if entry is None or entry[0] != stamp:
+        entry = known[path] = (stamp, _is_sum(path))
+    return entry[1]
+
+class _Report:
+    """Console lines of one SUM, held back so concurrently processed files print in one piece"""
+
+    def __init__(self):
+        self.lines = []
+
+    def echo(self, message: str, **style):
+        self.lines.append((message, style))
+
+    def show(self, err: bool = False):
+        for message, style in self.lines:
+            click.secho(message, err=err, **style)
+
+def _process(model_file: Path, report: _Report, checker: Optional[ModelChecker], builder: Optional[FMUBuilder],
+             jobs: int, cache: Optional[CheckCache], prune: bool, keep: tuple,
+             checked_before: Optional[Dict[Path, Tuple[str, Tuple[bool, str]]]] = None) -> dict:
+    """
+    Parses, generates, checks and exports one SUM; returns its summary entry. cache is the check
+    cache of the SUM's generated/ directory, shared with the other SUMs there and saved by the caller.
+    checked_before maps submodel paths to the digest and result of their last check; submodels whose
+    digest is unchanged reuse that result, and the mapping is updated with the new results.
+    """
+    summary = {"file": str(model_file), "passed": True, "timings": {}}
+    timings = summary["timings"]
+    started = time.perf_counter()
+    report.echo(f"\nProcessing {model_file.name}", bold=True)
 
-@click.command()
-@click.argument("model_file", type=click.Path(exists=True, path_type=Path))
-@click.option("--check", is_flag=True, help="Enable model checking")
-def main(model_file: Path, check: bool):
-    """ModeGen - Modelica Mode Generator"""
-    click.secho(f"\nProcessing {model_file.name}", bold=True)
-    
     # Parse and generate models
     parser = ModelicaAnnotationParser()
     generator = ModelicaGenerator()
     modes = parser.parse(model_file)
-    generator.generate(model_file, modes)
-    
-    click.echo(f"{len(modes)} submodels are generated")
-    
+    timings["parse"] = time.perf_counter() - started
+    if prune:
+        start = time.perf_counter()
+        dropped = DeclarationPruner(keep=list(keep) + parser.shared).prune(modes)
+        for mode, count in dropped.items():
+            report.echo(f"  {mode}: {count} unused declaration lines dropped")
+        timings["prune"] = time.perf_counter() - start
+    start = time.perf_counter()
+    generated = generator.generate(model_file, modes)
+    timings["generate"] = time.perf_counter() - start
+
+    written = sum(model.written for model in generated.values())
+    submodels = len({m.path for m in generated.values()})
+    report.echo(f"{submodels} submodels are generated for {len(modes)} modes ({written} changed)")
+    for mode, model in generated.items():
+        if model.canonical != mode:
+            report.echo(f"  {mode} uses the submodel of {model.canonical}")
+    summary.update(modes=len(modes), submodels=submodels, changed=written,
+                   submodel={mode: model.path.name for mode, model in generated.items()})
+
+    distinct = {mode: model.path for mode, model in generated.items() if model.canonical == mode}
+
     # Model checking logic
-    if check:
-        checker = ModelChecker()
-        all_pass = True
-        results = {}
-        
-        click.echo("\nModel checking results:")
-        for mode in modes.keys():
-            submodel = model_file.parent / "generated" / f"{model_file.stem}_{mode}.mo"
-            is_valid, message = checker.check(submodel)
-            
+    if checker is not None:
+        # Duplicate modes share their canonical submodel, which is checked once
+        start = time.perf_counter()
+        check_cache = cache.view() if cache is not None else None
+        unchanged = {}
+        if checked_before is not None:
+            unchanged = {path: checked_before[path][1] for mode, path in distinct.items()
+                         if checked_before.get(path, ("",))[0] == generated[mode].digest}
+        checked = checker.check_all([path for path in distinct.values() if path not in unchanged],
+                                    jobs=jobs, cache=check_cache)
+        checked.update(unchanged)
+        if checked_before is not None:
+            checked_before.update({path: (generated[mode].digest, checked[path]) for mode, path in distinct.items()})
+        timings["check"] = time.perf_counter() - start
+        if check_cache is not None and check_cache.hits:
+            report.echo(f"{check_cache.hits} unchanged submodels passed before and were not checked again")
+        if unchanged:
+            report.echo(f"{len(unchanged)} submodels are unchanged since the last check and were not checked again")
+        summary["check"] = {}
+        summary["cache_hits"] = check_cache.hits if check_cache is not None else 0
+
+        # Report in mode order, whatever order the checks finished in
+        report.echo("\nModel checking results:")
+        for mode, model in generated.items():
+            is_valid, message = checked[model.path]
+            name = model.path.name if model.canonical == mode else f"{model.path.name} for {mode}"
+
             if is_valid:
-                click.secho(f"  ✓ {submodel.name} (PASS)", fg="green")
+                report.echo(f"  ✓ {name} (PASS)", fg="green")
             else:
-                click.secho(f"  ✗ {submodel.name} (FAIL)", fg="red")
-                click.echo(f"    {message}")
-                all_pass = False
-                
-            results[mode] = is_valid
-        
-        # Final outcome
+                report.echo(f"  ✗ {name} (FAIL)", fg="red")
+                if model.canonical == mode:
+                    report.echo(f"    {message}")
+                summary["passed"] = False
+
+            summary["check"][mode] = is_valid
+
+    # FMU export of the distinct submodels
+    if builder is not None:
+        start = time.perf_counter()
+        generated_dir = model_file.parent / "generated"
+        built = builder.build_all(distinct.values(), generated_dir / f"FMI{builder.fmi_version}")
+        timings["build"] = time.perf_counter() - start
+        summary["build"] = {}
+
+        report.echo(f"\nFMU export results (FMI {builder.fmi_version}):")
+        for path, result in built.items():
+            if result.success:
+                report.echo(f"  ✓ {result.fmu.name} ({'cached' if result.cached else 'built'})", fg="green")
+            else:
+                report.echo(f"  ✗ {path.stem}.fmu (FAIL)", fg="red")
+                report.echo(f"    {result.message}")
+                summary["passed"] = False
+            summary["build"][path.stem] = "failed" if not result.success else "cached" if result.cached else "built"
+
+    timings["total"] = time.perf_counter() - started
+    return summary
+
+def _run(model_file: Path, report: _Report, *args, **kwargs) -> dict:
+    """_process that turns unreadable or malformed SUMs into a failed summary entry"""
+    try:
+        return _process(model_file, report, *args, **kwargs)
+    except (OSError, ValueError) as e:
+        report.echo(f"  ✗ {model_file.name}: {e}", fg="red")
+        return {"file": str(model_file), "passed": False, "error": str(e)}
+
+WATCH_INTERVAL = 0.25  # Seconds between two polls of the watched SUMs
+
+def _stamps(model_files: tuple,
+            known: Optional[Dict[Path, Tuple[Tuple[int, int], bool]]] = None) -> Optional[Dict[Path, Tuple[int, int]]]:
+    """Modification time and size of every SUM, None while an explicitly named file is missing"""
+    try:
+        files = _collect(model_files, known)
+    except click.BadParameter:
+        return None
+    stamps = {}
+    for path in files:
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        stamps[path] = (stat.st_mtime_ns, stat.st_size)
+    return stamps
+
+def _watch(model_files: tuple, stamps: Dict[Path, Tuple[int, int]], on_change: Callable[[List[Path]], None],
+           debounce: float):
+    """
+    Polls the SUMs until interrupted and calls on_change with the new or modified files once
+    they have been left alone for `debounce` seconds, so a save in several writes triggers one run.
+    Polls only stat the files; a file's content is read again only when it has changed.
+    """
+    known: Dict[Path, Tuple[Tuple[int, int], bool]] = {}
+    while True:
+        time.sleep(WATCH_INTERVAL)
+        current = _stamps(model_files, known)
+        if current is None or current == stamps:
+            continue
+        while True:
+            time.sleep(debounce)
+            settled = _stamps(model_files, known)
+            if settled == current:
+                break
+            current = settled
+        if current is None:
+            continue
+        changed = [path for path, stamp in current.items() if stamps.get(path) != stamp]
+        stamps = current
+        if changed:
+            on_change(changed)
+
+@click.command()
+@click.argument("model_files", nargs=-1, required=True)
+@click.option("--check", is_flag=True, help="Enable model checking")
+@click.option("--jobs", "-j", type=click.IntRange(min=1), default=None, help="Parallel model checks and SUMs (default: CPU count)")
+@click.option("--session/--no-session", default=True, help="Check in persistent OpenModelica sessions (needs OMPython)")
+@click.option("--cache/--no-cache", default=True, help="Reuse passed checks of unchanged submodels")
+@click.option("--prune", is_flag=True, help="Drop declarations not reachable from a mode's equations")
+@click.option("--keep", multiple=True, help="Name never pruned (repeatable); metadata 'Shared' names are always kept")
+@click.option("--build-fmu", is_flag=True, help="Export the submodels to co-simulation FMUs")
+@click.option("--fmi-version", type=click.Choice(["2.0", "3.0"]), default="2.0", help="FMI version of the exported FMUs")
+@click.option("--store", type=click.Path(path_type=Path), default=None, help="FMU artifact store (default: generated/.fmu_store)")
+@click.option("--omc", default="omc", help="OpenModelica compiler executable")
+@click.option("--summary", type=click.Path(allow_dash=True), default=None, help="Write a JSON summary with per-file timings ('-' for stdout)")
+@click.option("--watch", is_flag=True, help="Keep running and reprocess SUMs when they change")
+@click.option("--debounce", type=click.FloatRange(min=0), default=0.3, help="Seconds a changed SUM must stay unchanged before --watch reprocesses it")
+def main(model_files: tuple, check: bool, jobs: int, session: bool, cache: bool, prune: bool, keep: tuple,
+         build_fmu: bool, fmi_version: str, store: Path, omc: str, summary: Optional[str], watch: bool,
+         debounce: float):
+    """ModeGen - Modelica Mode Generator
+
+    MODEL_FILES are SUM files, directories searched for SUMs, or glob patterns.
+    """
+    files = _collect(model_files)
+    if not files:
+        raise click.UsageError("No SUM files found")
+    started = time.perf_counter()
+    entries: Dict[Path, dict] = {}
+    # In watch mode, the digest and result of every checked submodel, so unchanged ones are not checked again
+    checked_before = {} if watch else None
+
+    # One check cache per generated/ directory, shared by all SUMs writing there and saved once per run
+    check_caches: Dict[Path, CheckCache] = {}
+    # With the summary on stdout, everything else goes to stderr so stdout stays valid JSON
+    err = summary == "-"
+
+    def cache_of(path: Path) -> Optional[CheckCache]:
+        if not (check and cache):
+            return None
+        directory = path.resolve().parent / "generated"
+        if directory not in check_caches:
+            check_caches[directory] = CheckCache(directory / ".modegen_checks.json")
+        return check_caches[directory]
+
+    def process(paths: List[Path]):
+        reports = [_Report() for _ in paths]
+        caches = [cache_of(path) for path in paths]
+
+        def run(i: int) -> dict:
+            return _run(paths[i], reports[i], checker, builder, jobs, caches[i], prune, keep,
+                        checked_before=checked_before)
+
+        if len(paths) == 1:
+            results = [run(0)]
+        else:
+            with ThreadPoolExecutor(max_workers=min(len(paths), jobs or os.cpu_count() or 1)) as pool:
+                results = list(pool.map(run, range(len(paths))))
+        for shared in check_caches.values():
+            if shared.path.parent.is_dir():
+                shared.save()
+        for report in reports:
+            report.show(err=err)
+        entries.update((path.resolve(), entry) for path, entry in zip(paths, results))
+
+    def write_summary():
+        document = {"files": list(entries.values()), "passed": all(e["passed"] for e in entries.values()),
+                    "total": time.perf_counter() - started,
+                    "checker": type(checker).__name__ if checker is not None else None,
+                    "fmi_version": fmi_version if build_fmu else None}
+        text = json.dumps(document, indent=2)
+        if summary == "-":
+            click.echo(text)
+        else:
+            Path(summary).write_text(text + "\n")
+
+    # One checker and one builder serve all files, so their pools bound the total work; in
+    # watch mode they stay open, which keeps OpenModelica sessions warm between changes
+    checker = _make_checker(session, jobs, omc) if check else None
+    builder = FMUBuilder(store, fmi_version=fmi_version, omc_path=omc, jobs=jobs) if build_fmu else None
+    try:
+        if builder is not None:
+            try:
+                builder.version()
+            except RuntimeError as e:
+                click.secho(f"\nFMU export not possible: {e}", fg="red", err=err)
+                sys.exit(1)
+        stamps = _stamps(model_files)
+        process(files)
+
+        if watch:
+            def on_change(changed: List[Path]):
+                process(changed)
+                if summary:
+                    write_summary()
+                click.echo(f"\nWatching {len(entries)} SUMs for changes (Ctrl+C to stop)", err=err)
+
+            if summary:
+                write_summary()
+            click.echo(f"\nWatching {len(files)} SUMs for changes (Ctrl+C to stop)", err=err)
+            try:
+                _watch(model_files, stamps, on_change, debounce)
+            except KeyboardInterrupt:
+                click.echo("\nStopped watching", err=err)
+                return
+    finally:
+        if checker is not None:
+            checker.close()
+        if builder is not None:
+            builder.close()
+
+    all_pass = all(entry["passed"] for entry in entries.values())
+    if summary:
+        write_summary()
+
+    # Final outcome
+    if len(files) > 1:
+        failed = [Path(entry["file"]).name for entry in entries.values() if not entry["passed"]]
+        click.echo(f"\n{len(files) - len(failed)} of {len(files)} SUMs processed without failures", err=err)
+        for name in failed:
+            click.secho(f"  ✗ {name}", fg="red", err=err)
+    if check or build_fmu:
         if all_pass:
-            click.secho("\nFINAL RESULT: ALL MODES PASS", fg="green", bold=True)
+            click.secho("\nFINAL RESULT: ALL MODES PASS", fg="green", bold=True, err=err)
         else:
-            click.secho("\nFINAL RESULT: SOME MODES FAIL", fg="red", bold=True)
-        return 0 if all_pass else 1
+            click.secho("\nFINAL RESULT: SOME MODES FAIL", fg="red", bold=True, err=err)
+    if check or build_fmu or not all_pass:
+        sys.exit(0 if all_pass else 1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,143 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+BUILD_SCRIPT = """loadModel(Modelica);
+loadFile("{model}");
+buildModelFMU({name}, version="{fmi_version}", fmuType="cs", fileNamePrefix="{name}");
+getErrorString();
+"""
+
+@dataclass
+class BuildResult:
+    """Outcome of exporting one submodel"""
+    success: bool
+    message: str
+    fmu: Optional[Path] = None  # Copy of the FMU next to the generated submodels
+    cached: bool = False  # True if the FMU came from the artifact store without compiling
+
+def _export(omc_path: str, model_path: str, fmi_version: str, target: str, timeout: float) -> Tuple[bool, str]:
+    """Runs one omc export in a scratch directory and moves the FMU to target; executed in a worker process"""
+    name = Path(model_path).stem
+    with tempfile.TemporaryDirectory(prefix="modegen_fmu_") as work:
+        script = Path(work) / "build.mos"
+        script.write_text(BUILD_SCRIPT.format(model=Path(model_path).resolve().as_posix(), name=name,
+                                              fmi_version=fmi_version))
+        try:
+            result = subprocess.run([omc_path, str(script)], cwd=work, stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return False, f"Timeout expired while exporting {name}."
+        except OSError as e:
+            return False, f"Export error for {name}: {e}"
+
+        fmu = Path(work) / f"{name}.fmu"
+        if result.returncode != 0 or not fmu.is_file():
+            return False, f"Error exporting {name}: {(result.stderr or result.stdout).strip()}"
+        # Rename into place so the store never holds a partially written FMU
+        Path(target).parent.mkdir(parents=True, exist_ok=True)
+        staged = Path(target).with_suffix(".partial")
+        shutil.copyfile(fmu, staged)
+        os.replace(staged, target)
+    return True, f"{name}.fmu exported."
+
+class FMUBuilder:
+    """
+    Exports generated submodels to co-simulation FMUs with omc, several at a time in worker
+    processes. FMUs are kept in a content-addressed store keyed by the submodel's SHA-256, the
+    FMI version and the omc version, so an unchanged submodel is never compiled twice. Without
+    a store, each submodel uses .fmu_store next to it.
+    """
+
+    def __init__(self, store: Optional[Path] = None, fmi_version: str = "2.0", omc_path: str = "omc",
+                 jobs: Optional[int] = None, timeout: float = 600):
+        if fmi_version not in ("2.0", "3.0"):
+            raise ValueError(f"Unsupported FMI version '{fmi_version}'")
+        self.store = Path(store) if store is not None else None
+        self.fmi_version = fmi_version
+        self.omc_path = omc_path
+        self.jobs = jobs or os.cpu_count() or 1
+        self.timeout = timeout
+        self._version = None
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def version(self) -> str:
+        """Returns the omc version string that is part of every artifact key"""
+        if self._version is None:
+            try:
+                result = subprocess.run([self.omc_path, "--version"], stdout=subprocess.PIPE,
+                                        stderr=subprocess.PIPE, text=True, timeout=30)
+            except (OSError, subprocess.TimeoutExpired) as e:
+                raise RuntimeError(f"Cannot run '{self.omc_path} --version': {e}") from e
+            if result.returncode != 0:
+                raise RuntimeError(f"'{self.omc_path} --version' failed: {result.stderr.strip()}")
+            self._version = result.stdout.strip()
+        return self._version
+
+    def artifact(self, model_path: Path) -> Path:
+        """Store location of the FMU for the current content of a submodel"""
+        key = hashlib.sha256()
+        key.update(hashlib.sha256(model_path.read_bytes()).hexdigest().encode())
+        key.update(f"|fmi{self.fmi_version}|{self.version()}".encode())
+        key = key.hexdigest()
+        store = self.store if self.store is not None else model_path.parent / ".fmu_store"
+        return store / key[:2] / key / f"{model_path.stem}.fmu"
+
+    def build_all(self, model_paths: Iterable[Path], output_dir: Path) -> Dict[Path, BuildResult]:
+        """Builds missing FMUs in parallel and copies every FMU to output_dir; results keep the input order"""
+        model_paths = list(model_paths)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        artifacts = {path: self.artifact(path) for path in model_paths}
+        results = {}
+
+        pending = [path for path in model_paths if not artifacts[path].is_file()]
+        if pending:
+            futures = {self._pool().submit(_export, self.omc_path, str(path), self.fmi_version,
+                                           str(artifacts[path]), self.timeout): path for path in pending}
+            for future in as_completed(futures):
+                success, message = future.result()
+                results[futures[future]] = BuildResult(success, message)
+
+        for path in model_paths:
+            if path not in results:
+                results[path] = BuildResult(True, f"{path.stem}.fmu is up to date.", cached=True)
+            if results[path].success:
+                results[path].fmu = self._publish(artifacts[path], output_dir)
+        return {path: results[path] for path in model_paths}
+
+    def _pool(self) -> ProcessPoolExecutor:
+        """Worker processes shared by all build_all calls until close()"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.jobs)
+            return self._executor
+
+    def close(self):
+        """Stops the worker processes"""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def _publish(artifact: Path, output_dir: Path) -> Path:
+        """Copies a stored FMU to output_dir unless an identical copy is already there"""
+        target = output_dir / artifact.name
+        if not (target.is_file() and target.stat().st_size == artifact.stat().st_size
+                and target.read_bytes() == artifact.read_bytes()):
+            shutil.copyfile(artifact, target)
+        return target
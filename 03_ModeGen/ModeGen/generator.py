@@ -1,66 +1,156 @@
+import hashlib
+import json
+import re
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Dict
-from .parser import ModeDefinition
+from typing import Dict, Iterator, Optional
+from .parser import SECTIONS, ModeDefinition
+
+@dataclass
+class GeneratedModel:
+    """A generated submodel file and the SHA-256 of its content"""
+    path: Path
+    digest: str
+    written: bool  # False if the file already had this content
+    canonical: str = ""  # Mode whose submodel this mode uses; differs from the mode itself for duplicates
 
 class ModelicaGenerator:
     """Generates Modelica submodels from mode definitions"""
+
+    STRING = re.compile(r'("(?:[^"\\]|\\.)*(?:"|$))')  # String literal with escapes; unterminated runs to the line end
+    SPACING = re.compile(r'\s*([^\w\s.])\s*')  # Whitespace around operators and punctuation
     
-    def generate(self, base_model_path: Path, modes: Dict[str, ModeDefinition]):
-        """Creates separate .mo files for each mode"""
+    def generate(self, base_model_path: Path, modes: Dict[str, ModeDefinition]) -> Dict[str, GeneratedModel]:
+        """
+        Creates separate .mo files for each mode; files whose content is unchanged are not rewritten.
+        Modes whose submodels are identical apart from the model name share the file of the first
+        such mode, and <Model>_modes.json maps every mode to the submodel it uses. Submodel files of
+        duplicate modes and of modes listed in the previous mapping but no longer generated are removed.
+        """
         model_name = base_model_path.stem
         output_dir = base_model_path.parent / "generated"
         output_dir.mkdir(exist_ok=True)
         
+        generated = {}
+        canonical = {}  # Canonical digest -> first mode with that submodel
         for mode_name, mode_def in modes.items():
-            self._write_mode_model(
+            first = canonical.setdefault(self.canonical_digest(mode_def), mode_name)
+            if first != mode_name:
+                generated[mode_name] = replace(generated[first], written=False)
+                continue
+            generated[mode_name] = self._write_mode_model(
                 output_dir=output_dir,
                 model_name=model_name,
                 mode_name=mode_name,
                 mode_def=mode_def
             )
+            generated[mode_name].canonical = mode_name
+        mapping_path = output_dir / f"{model_name}_modes.json"
+        self._remove_stale(output_dir, model_name, mapping_path, generated)
+        self._write_mapping(mapping_path, model_name, generated)
+        return generated
+
+    @staticmethod
+    def _remove_stale(output_dir: Path, model_name: str, mapping_path: Path, generated: Dict[str, GeneratedModel]):
+        """Deletes submodel files no mode uses any more, so checks and FMU builds cannot pick them up"""
+        stale = {output_dir / f"{model_name}_{mode}.mo" for mode in generated}
+        try:
+            with open(mapping_path, 'r') as f:
+                stale.update(output_dir / Path(entry["file"]).name for entry in json.load(f)["modes"].values())
+        except (OSError, ValueError, KeyError):
+            pass
+        stale -= {model.path for model in generated.values()}
+        for path in stale:
+            path.unlink(missing_ok=True)
+
+    def canonical_digest(self, mode_def: ModeDefinition) -> str:
+        """SHA-256 of a mode's content without model name, comments, blank lines and insignificant whitespace"""
+        digest = hashlib.sha256()
+        for section in SECTIONS:
+            digest.update(f"[{section}]\n".encode())
+            for line in getattr(mode_def, section):
+                line = self._normalize(line)
+                if line:
+                    digest.update(f"{line}\n".encode())
+        return digest.hexdigest()
+
+    def _normalize(self, line: str) -> str:
+        """A line without its comment and insignificant whitespace; string literals are kept as they are"""
+        tokens = []
+        for i, part in enumerate(self.STRING.split(line)):
+            if i % 2:
+                tokens.append(part)
+                continue
+            code, comment, _ = part.partition("//")
+            tokens.append(self.SPACING.sub(r"\1", " ".join(code.split())))
+            if comment:
+                break
+        return "".join(tokens)
+
+    def _write_mapping(self, path: Path, model_name: str, generated: Dict[str, GeneratedModel]):
+        """Writes the mode -> submodel mapping, leaving the file untouched if it is unchanged"""
+        mapping = {
+            "model": model_name,
+            "modes": {mode: {"submodel": model.path.stem, "file": model.path.name, "sha256": model.digest}
+                      for mode, model in generated.items()},
+        }
+        content = json.dumps(mapping, indent=2) + "\n"
+        if self._file_digest(path) != hashlib.sha256(content.encode()).hexdigest():
+            with open(path, 'w') as f:
+                f.write(content)
     
-    def _write_mode_model(self, output_dir: Path, model_name: str, 
-                        mode_name: str, mode_def: ModeDefinition):
-        """Writes a complete Modelica file for one mode"""
+    def _write_mode_model(self, output_dir: Path, model_name: str,
+                        mode_name: str, mode_def: ModeDefinition) -> GeneratedModel:
+        """Streams a complete Modelica file for one mode, leaving it untouched if the content is unchanged"""
         output_path = output_dir / f"{model_name}_{mode_name}.mo"
+        digest = hashlib.sha256()
+        for chunk in self._chunks(model_name, mode_name, mode_def):
+            digest.update(chunk.encode())
+        digest = digest.hexdigest()
+
+        written = self._file_digest(output_path) != digest
+        if written:
+            with open(output_path, 'w') as f:
+                f.writelines(self._chunks(model_name, mode_name, mode_def))
+        return GeneratedModel(path=output_path, digest=digest, written=written)
+
+    @staticmethod
+    def _file_digest(path: Path) -> Optional[str]:
+        """SHA-256 of an existing text file as ModeGen would write it, None if it does not exist"""
+        try:
+            digest = hashlib.sha256()
+            with open(path, 'r') as f:
+                for line in f:
+                    digest.update(line.encode())
+            return digest.hexdigest()
+        except FileNotFoundError:
+            return None
+
+    def render(self, model_name: str, mode_name: str, mode_def: ModeDefinition) -> str:
+        """Returns the Modelica source of one mode"""
+        return "".join(self._chunks(model_name, mode_name, mode_def))
+
+    def _chunks(self, model_name: str, mode_name: str, mode_def: ModeDefinition) -> Iterator[str]:
+        """Yields the Modelica source of one mode line by line from the shared line table"""
+        # Write model header
+        yield f"model {model_name}_{mode_name}\n"
+        yield "  // Auto-generated by ModeGen\n\n"
+        
+        # Write declarations (parameters, variables, constants)
+        for decl in mode_def.declarations:
+            yield f"  {decl}\n"
+        yield "\n"
+        
+        # Write equation, initial equation, algorithm and initial algorithm blocks if they exist
+        for header, lines in (("equation", mode_def.equations),
+                              ("initial equation", mode_def.initial_equations),
+                              ("algorithm", mode_def.algorithms),
+                              ("initial algorithm", mode_def.initial_algorithms)):
+            if lines:
+                yield f"{header}\n"
+                for line in lines:
+                    yield f"  {line}\n"
+                yield "\n"
         
-        with open(output_path, 'w') as f:
-            # Write model header
-            f.write(f"model {model_name}_{mode_name}\n")
-            f.write("  // Auto-generated by ModeGen\n\n")
-            
-            # Write declarations (parameters, variables, constants)
-            for decl in mode_def.declarations:
-                f.write(f"  {decl}\n")
-            f.write("\n")
-            
-            # Write equation block if exists
-            if mode_def.equations:
-                f.write("equation\n")
-                for eq in mode_def.equations:
-                    f.write(f"  {eq}\n")
-                f.write("\n")
-            
-            # Write initial equation block if exists
-            if mode_def.initial_equations:
-                f.write("initial equation\n")
-                for eq in mode_def.initial_equations:
-                    f.write(f"  {eq}\n")
-                f.write("\n")
-            
-            # Write algorithm block if exists
-            if mode_def.algorithms:
-                f.write("algorithm\n")
-                for algo in mode_def.algorithms:
-                    f.write(f"  {algo}\n")
-                f.write("\n")
-            
-            # Write initial algorithm block if exists
-            if mode_def.initial_algorithms:
-                f.write("initial algorithm\n")
-                for algo in mode_def.initial_algorithms:
-                    f.write(f"  {algo}\n")
-                f.write("\n")
-            
-            # Write model end
-            f.write(f"end {model_name}_{mode_name};\n")
\ No newline at end of file
+        # Write model end
+        yield f"end {model_name}_{mode_name};\n"
@@ -1,24 +1,94 @@
-from typing import Tuple
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+import copy
+import hashlib
+import json
+import os
+import queue
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from .omc_session import OMPythonSession
+
+class CheckCache:
+    """
+    Passed checks keyed by the SHA-256 of the submodel file and the omc version, stored as JSON.
+    Failures are never cached, so a failing submodel is checked again on the next run. The cache
+    is thread-safe; views share its entries but count their own hits.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.hits = 0
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r') as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+        self._saved = len(self.entries)  # Only passes are added, so a larger dict has new entries
+
+    def view(self) -> 'CheckCache':
+        """A cache on the same entries with its own hit count, e.g. for one of several SUMs checked at once"""
+        view = copy.copy(self)
+        view.hits = 0
+        return view
+
+    @staticmethod
+    def key(model_path: Path, version: str) -> str:
+        digest = hashlib.sha256(model_path.read_bytes()).hexdigest()
+        return f"{version}|{digest}"
+
+    def get(self, model_path: Path, version: str) -> Optional[Tuple[bool, str]]:
+        key = self.key(model_path, version)
+        with self._lock:
+            entry = self.entries.get(key)
+        if entry is None:
+            return None
+        self.hits += 1
+        return True, entry
+
+    def put(self, model_path: Path, version: str, result: Tuple[bool, str]):
+        if result[0]:
+            key = self.key(model_path, version)
+            with self._lock:
+                self.entries[key] = result[1]
+
+    def save(self):
+        """Writes the entries if any were added, including those added through views"""
+        with self._lock:
+            if len(self.entries) == self._saved:
+                return
+            with open(self.path, 'w') as f:
+                json.dump(self.entries, f, indent=1, sort_keys=True)
+            self._saved = len(self.entries)
 
 class ModelChecker:
     """Validates Modelica files using OpenModelica compiler"""
     
     def __init__(self, omc_path: str = "omc"):
         self.omc_path = omc_path
+        self._version = None
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def version(self) -> Optional[str]:
+        """Returns the omc version string, None if omc cannot be run"""
+        if self._version is None:
+            try:
+                result = subprocess.run([self.omc_path, "--version"], stdout=subprocess.PIPE,
+                                        stderr=subprocess.PIPE, text=True, timeout=30)
+                if result.returncode == 0:
+                    self._version = result.stdout.strip()
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+        return self._version
     
     def check(self, model_path: Path) -> Tuple[bool, str]:
         """Checks model syntax using OMC and returns a boolean result with message"""
         try:
-            # Debugging: print the omc path to confirm it's found
-            print(f"Calling OpenModelica compiler for model checking")
-
-            # Debugging: print the full command being executed
+            # Execute the OpenModelica command; nothing is printed here, since checks run on pool threads
             command = [self.omc_path, str(model_path)]
-            print(f"Running command: {' '.join(command)}")
-
-            # Execute the OpenModelica command
             result = subprocess.run(
                 command,
                 stdout=subprocess.PIPE,
@@ -36,4 +106,144 @@ class ModelChecker:
         except subprocess.TimeoutExpired:
             return False, f"Timeout expired while validating {model_path.name}."
         except Exception as e:
-            return False, f"Validation error for {model_path.name}: {e}"
\ No newline at end of file
+            return False, f"Validation error for {model_path.name}: {e}"
+
+    def check_all(self, model_paths: Iterable[Path], jobs: Optional[int] = None,
+                  cache: Optional[CheckCache] = None) -> Dict[Path, Tuple[bool, str]]:
+        """
+        Checks models concurrently, at most `jobs` (default: CPU count) at a time; results keep the input order.
+        With a cache, submodels that already passed with the same content and omc version are not checked again;
+        new passes are added to it, and the caller saves it.
+        """
+        model_paths = list(model_paths)
+        results = {}
+        version = self.version() if cache is not None else None
+        pending = []
+        for path in model_paths:
+            hit = cache.get(path, version) if version else None
+            if hit is not None:
+                results[path] = hit
+            else:
+                pending.append(path)
+
+        # Each check waits on its own omc process, so threads are enough to run them in parallel
+        if pending:
+            futures = {self._pool(jobs).submit(self.check, path): path for path in pending}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+
+        if version:
+            for path in pending:
+                cache.put(path, version, results[path])
+        return {path: results[path] for path in model_paths}
+
+    def _pool(self, jobs: Optional[int]) -> ThreadPoolExecutor:
+        """
+        Thread pool shared by all check_all calls, so concurrent callers (e.g. several SUMs
+        processed at once) never run more than `jobs` checks together; sized by the first call.
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1)
+            return self._executor
+
+    def close(self):
+        """Releases resources held by the checker"""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class SessionChecker(ModelChecker):
+    """
+    Validates Modelica files in long-lived OpenModelica sessions. Libraries are loaded once
+    per session and reused for every model; up to `sessions` sessions are started on demand.
+    """
+
+    def __init__(self, sessions: Optional[int] = None, session_factory: Callable = OMPythonSession,
+                 libraries: Sequence[str] = ("Modelica",)):
+        self.sessions = sessions or os.cpu_count() or 1
+        self.session_factory = session_factory
+        self.libraries = tuple(libraries)
+        self._version = None
+        self._idle = queue.Queue()
+        self._started = []
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            start = len(self._started) < self.sessions
+            if start:
+                self._started.append(None)
+        if not start:
+            return self._idle.get()
+        try:
+            session = self.session_factory()
+            for library in self.libraries:
+                session.send(f"loadModel({library})")
+        except Exception:
+            with self._lock:
+                self._started.remove(None)
+            raise
+        with self._lock:
+            self._started[self._started.index(None)] = session
+        return session
+
+    def check(self, model_path: Path) -> Tuple[bool, str]:
+        """Loads the model into an idle session and runs checkModel on it"""
+        try:
+            session = self._acquire()
+        except Exception as e:
+            return False, f"Validation error for {model_path.name}: {e}"
+        model_name = model_path.stem  # ModeGen writes one model per file, named like the file
+        try:
+            if session.send(f'loadFile("{model_path.resolve().as_posix()}")') is not True:
+                return False, f"Error in {model_path.name}: {session.send('getErrorString()') or 'loadFile failed'}"
+            result = session.send(f"checkModel({model_name})") or ""
+            errors = session.send("getErrorString()") or ""
+            session.send(f"deleteClass({model_name})")  # Keeps the session free of earlier submodels
+            if "completed successfully" in result:
+                return True, f"{model_path.name} passed validation."
+            return False, f"Error in {model_path.name}: {errors or result}"
+        except Exception as e:
+            return False, f"Validation error for {model_path.name}: {e}"
+        finally:
+            self._idle.put(session)
+
+    def version(self) -> Optional[str]:
+        """Returns the version reported by an OMC session, None if no session can be started"""
+        if self._version is None:
+            try:
+                session = self._acquire()
+            except Exception:
+                return None
+            try:
+                self._version = session.send("getVersion()")
+            finally:
+                self._idle.put(session)
+        return self._version
+
+    def check_all(self, model_paths: Iterable[Path], jobs: Optional[int] = None,
+                  cache: Optional[CheckCache] = None) -> Dict[Path, Tuple[bool, str]]:
+        return super().check_all(model_paths, jobs=jobs or self.sessions, cache=cache)
+
+    def close(self):
+        """Ends all sessions"""
+        super().close()
+        with self._lock:
+            sessions, self._started = [s for s in self._started if s is not None], []
+        for session in sessions:
+            session.close()
+        self._idle = queue.Queue()
@@ -0,0 +1,59 @@
+import re
+from pathlib import Path
+from typing import Callable, List, Optional
+
+class OMPythonSession:
+    """Long-lived interactive omc process driven through OMPython's ZeroMQ interface"""
+
+    def __init__(self, omhome: Optional[str] = None):
+        try:
+            from OMPython import OMCSessionZMQ  # type: ignore
+        except ImportError as e:
+            raise ImportError("Persistent OpenModelica sessions require OMPython (pip install OMPython)") from e
+        self._session = OMCSessionZMQ(omhome=omhome)
+
+    def send(self, expression: str):
+        """Evaluates one OpenModelica scripting expression and returns the parsed result"""
+        return self._session.sendExpression(expression)
+
+    def close(self):
+        try:
+            self._session.sendExpression("quit()", parsed=False)
+        except Exception:
+            pass
+
+class ScriptedSession:
+    """
+    Stand-in for an OMC session without OpenModelica installed. Every expression is recorded
+    in `commands` and answered by `script(expression)`; the default script loads existing files
+    and passes every checkModel.
+    """
+
+    LOAD_FILE = re.compile(r'loadFile\("(.*)"\)')
+    CHECK_MODEL = re.compile(r'checkModel\((.*)\)')
+
+    def __init__(self, script: Optional[Callable[[str], object]] = None):
+        self.script = script or self.default_script
+        self.commands: List[str] = []
+        self.closed = False
+
+    @classmethod
+    def default_script(cls, expression: str):
+        load = cls.LOAD_FILE.fullmatch(expression)
+        if load:
+            return Path(load.group(1)).is_file()
+        check = cls.CHECK_MODEL.fullmatch(expression)
+        if check:
+            return f"Check of {check.group(1)} completed successfully.\nClass {check.group(1)} has 0 equation(s) and 0 variable(s).\n"
+        if expression == "getErrorString()":
+            return ""
+        if expression == "getVersion()":
+            return "OpenModelica stand-in"
+        return True
+
+    def send(self, expression: str):
+        self.commands.append(expression)
+        return self.script(expression)
+
+    def close(self):
+        self.closed = True
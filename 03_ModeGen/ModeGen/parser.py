@@ -1,113 +1,217 @@
 import re
-from dataclasses import dataclass
-from typing import Dict, List
+from collections.abc import Sequence
+from typing import Dict, Iterable, Iterator, List, Optional
 
-@dataclass
-class ModeDefinition:
-    """Stores metadata for each operational mode"""
-    declarations: List[str]  # All components (variables, parameters, constants, imports, etc.)
-    equations: List[str]  # Regular equations
-    initial_equations: List[str]  # Initial equations
-    algorithms: List[str]  # Algorithm blocks
-    initial_algorithms: List[str]  # Initial algorithm blocks
+SECTIONS = ("declarations", "equations", "initial_equations", "algorithms", "initial_algorithms")
+
+class LineTable:
+    """
+    Lines of a SUM, stored once per section with a bitmap of the modes they belong to.
+    Bit i of a mask stands for the i-th mode; equal lines share one interned string.
+    """
 
     def __init__(self):
-        self.declarations = []
-        self.equations = []
-        self.initial_equations = []
-        self.algorithms = []
-        self.initial_algorithms = []
+        self.lines = {section: [] for section in SECTIONS}
+        self.masks = {section: [] for section in SECTIONS}
+        self._interned = {}
+
+    def add(self, section: str, line: str, mask: int):
+        if mask:
+            self.lines[section].append(self._interned.setdefault(line, line))
+            self.masks[section].append(mask)
+
+    def select(self, section: str, mask: int) -> Iterator[str]:
+        """Yields the lines of a section that belong to any mode of the mask"""
+        for line, line_mask in zip(self.lines[section], self.masks[section]):
+            if line_mask & mask:
+                yield line
+
+class ModeLines(Sequence):
+    """Lazy view of one section of one mode in a LineTable"""
+
+    def __init__(self, table: LineTable, section: str, bit: int):
+        self._table = table
+        self._section = section
+        self._bit = bit
+
+    def __iter__(self):
+        return self._table.select(self._section, self._bit)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __bool__(self):
+        return any(True for _ in self)
+
+    def __getitem__(self, index):
+        return list(self)[index]
+
+    def __eq__(self, other):
+        return isinstance(other, Sequence) and list(self) == list(other)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def append(self, line: str):
+        self._table.add(self._section, line, self._bit)
+
+class ModeDefinition:
+    """Stores metadata for each operational mode as views of a line table shared by all modes"""
+
+    def __init__(self, table: Optional[LineTable] = None, bit: int = 1):
+        self.table = table if table is not None else LineTable()
+        self.bit = bit
+        self.declarations = ModeLines(self.table, "declarations", bit)  # All components (variables, parameters, constants, imports, etc.)
+        self.equations = ModeLines(self.table, "equations", bit)  # Regular equations
+        self.initial_equations = ModeLines(self.table, "initial_equations", bit)  # Initial equations
+        self.algorithms = ModeLines(self.table, "algorithms", bit)  # Algorithm blocks
+        self.initial_algorithms = ModeLines(self.table, "initial_algorithms", bit)  # Initial algorithm blocks
+
+    def __repr__(self):
+        sections = ", ".join(f"{section}={getattr(self, section)!r}" for section in SECTIONS)
+        return f"{self.__class__.__name__}({sections})"
+
+class _ListCapture:
+    """Collects a 'Key: [a, b, ...]' metadata list, which may span several lines"""
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.text: Optional[str] = None
+        self.items: Optional[List[str]] = None
+
+    def feed(self, line: str) -> bool:
+        """Returns True once, on the line that completes the list"""
+        if self.items is not None:
+            return False
+        if self.text is None:
+            start = self.pattern.search(line)
+            if not start:
+                return False
+            self.text = line[start.end():]
+        else:
+            self.text += '\n' + line
+        if ']' not in self.text:
+            return False
+        self.items = [item.strip() for item in self.text[:self.text.index(']')].split(',')]
+        return True
 
 class ModelicaAnnotationParser:
-    """Parses ModeGen annotations from Modelica files"""
-    
+    """Parses ModeGen annotations from Modelica files in a single streaming pass"""
+
     # Patterns to detect the annotations and other Modelica elements
     MODE_TAG = re.compile(r'/*#\s*\[([a-zA-Z0-9_]+)\]')  # Mode annotation (e.g., /*# [pendulum] */)
     EQUATION_BLOCK_START = re.compile(r'@#\s*equation')
     ALGORITHM_BLOCK_START = re.compile(r'@#\s*algorithm')
     END_MODEL = re.compile(r'@#\s*end\s*(\w+)')
-    MODEL_START = re.compile(r'^\s*model\s+(\w+)')  # Match the start of a model
+    MODEL_START = re.compile(r'^\s*model')  # Match the start of a model
+    MODES_START = re.compile(r'Modes:\s*\[', re.IGNORECASE)  # Mode list in MODEL-METADATA
+    SHARED_START = re.compile(r'Shared:\s*\[', re.IGNORECASE)  # Shared variables in MODEL-METADATA
+
+    # Line tokens
+    TEXT, TAG, MODEL, EQUATION, ALGORITHM, END = range(6)
+
+    def __init__(self):
+        self.shared: List[str] = []  # Shared variables of the last parsed SUM
 
     def parse(self, file_path: str) -> Dict[str, ModeDefinition]:
         """Extracts mode definitions from annotated Modelica file"""
         with open(file_path, 'r') as f:
-            content = f.read()
-        
-        # Detect modes
-        modes = self._detect_modes(content)
-        
-        # Parse content and populate mode definitions
-        self._parse_content(content, modes)
-        
-        return modes
-    
-    def _detect_modes(self, content: str) -> Dict[str, ModeDefinition]:
-        """Extracts mode names ONLY from metadata"""
-        metadata_match = re.search(r'Modes:\s*\[([^\]]+)\]', content, re.IGNORECASE)
-        if not metadata_match:
-            raise ValueError("ERROR: No 'Modes' section found in MODEL-METADATA!")
-        
-        # Extract modes from metadata
-        mode_list = [mode.strip() for mode in metadata_match.group(1).split(',')]
-        
-        # Initialize mode definitions
-        modes = {mode: ModeDefinition() for mode in mode_list}
-        
-        return modes
-    
-    def _parse_content(self, content: str, modes: Dict[str, ModeDefinition]):
-        """Populates mode definitions with variables, parameters, and equations"""
-        current_modes = set()  # Set of active modes for the current section
+            return self.parse_lines(f)
+
+    def parse_lines(self, lines: Iterable[str]) -> Dict[str, ModeDefinition]:
+        """
+        Extracts mode definitions from an iterable of lines without holding the whole file.
+        The MODEL-METADATA header must name the modes before the first mode annotation.
+        """
+        modes: Optional[Dict[str, ModeDefinition]] = None
+        table = LineTable()
+        mode_list = _ListCapture(self.MODES_START)
+        shared_list = _ListCapture(self.SHARED_START)
+        current = 0  # Bitmap of the active modes for the current section
         in_model_block = False
         in_equation_block = False
         in_algorithm_block = False
+        seen_model = False
 
-        # Iterate through lines in content
-        for line in content.splitlines():
+        for line in lines:
             line = line.strip()
 
+            # Mode names come from the first 'Modes: [...]' in the file, shared variables from the header
+            if modes is None and mode_list.feed(line):
+                modes = self._detect_modes(mode_list.items, table)
+                all_modes = (1 << len(modes)) - 1
+            if not seen_model:
+                shared_list.feed(line)
+
+            token, mode_name = self._tokenize(line)
+
             # Detect mode annotation (e.g., /*# [pendulum] */)
-            mode_match = self.MODE_TAG.search(line)
-            if mode_match:
-                mode_name = mode_match.group(1)
-                current_modes = {mode_name} if mode_name != "All" else set(modes.keys())
+            if token == self.TAG:
+                if modes is None:
+                    raise ValueError("ERROR: No 'Modes' section found in MODEL-METADATA!")
+                if mode_name.lower() == "all":
+                    current = all_modes
+                else:
+                    if mode_name not in modes:
+                        raise ValueError(f"ERROR: Mode '{mode_name}' is not listed in MODEL-METADATA!")
+                    current = modes[mode_name].bit
                 continue
 
             # Handle model start (find the start of the model block)
-            if re.match(r'^\s*model', line):
-                in_model_block = True
+            if token == self.MODEL:
+                in_model_block = seen_model = True
                 continue
 
-            # Handle equation block
-            if in_model_block and self.EQUATION_BLOCK_START.search(line):
-                in_model_block = False
-                in_equation_block = True  # We are now in the equation block
+            # Handle equation and algorithm blocks
+            if token == self.EQUATION and (in_model_block or in_algorithm_block):
+                in_model_block = in_algorithm_block = False
+                in_equation_block = True
+                continue
+            if token == self.ALGORITHM and (in_model_block or in_equation_block):
+                in_model_block = in_equation_block = False
+                in_algorithm_block = True
                 continue
 
             # Collect everything between model and equation
             if in_model_block:
-                # Here we collect everything (declarations, library components, variables)
-                # Add it to the appropriate modes
-                for mode in current_modes:
-                    modes[mode].declarations.append(line)
-
-            # Handle equation block
-            if in_equation_block:
-                if line.lower().startswith("equation"):
-                    continue  # Skip the "equation" header line
-                if line:  # Non-empty lines
-                    for mode in current_modes:
-                        modes[mode].equations.append(line)
-
-            # Handle algorithm blocks (if any)
-            if in_algorithm_block:
-                if line.lower().startswith("algorithm"):
-                    continue  # Skip the "algorithm" header line
-                if line:  # Non-empty lines
-                    for mode in current_modes:
-                        modes[mode].algorithms.append(line)
+                table.add("declarations", line, current)
+
+            if in_equation_block and line and not line.lower().startswith("equation"):
+                table.add("equations", line, current)
+
+            if in_algorithm_block and line and not line.lower().startswith("algorithm"):
+                table.add("algorithms", line, current)
 
             # End of the model block or other sections
+            if token == self.END:
+                in_equation_block = in_algorithm_block = False
+
+        if modes is None:
+            raise ValueError("ERROR: No 'Modes' section found in MODEL-METADATA!")
+        self.shared = [name for name in shared_list.items or [] if name]
+        return modes
+
+    def _tokenize(self, line: str):
+        """Classifies a stripped line; lines without '#' or a leading 'model' are plain text"""
+        if '#' in line:
+            tag = self.MODE_TAG.search(line)
+            if tag:
+                return self.TAG, tag.group(1)
+        if line.startswith('model') and self.MODEL_START.match(line):
+            return self.MODEL, None
+        if '@#' in line:
+            if self.EQUATION_BLOCK_START.search(line):
+                return self.EQUATION, None
+            if self.ALGORITHM_BLOCK_START.search(line):
+                return self.ALGORITHM, None
             if self.END_MODEL.search(line):
-                in_equation_block = in_algorithm_block = False  # Exit equation or algorithm block
-                continue
\ No newline at end of file
+                return self.END, None
+        return self.TEXT, None
+
+    def _detect_modes(self, mode_list: List[str], table: LineTable) -> Dict[str, ModeDefinition]:
+        """Creates one mode definition (one bit of the line table) per name of the metadata mode list"""
+        modes = {}
+        for mode in mode_list:
+            if mode not in modes:
+                modes[mode] = ModeDefinition(table, 1 << len(modes))
+        return modes
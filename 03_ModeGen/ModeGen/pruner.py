@@ -0,0 +1,112 @@
+import re
+from typing import Dict, Iterable, List, Set, Tuple
+from .parser import ModeDefinition
+
+class DeclarationPruner:
+    """Drops declarations that a mode's equations and algorithms never reach"""
+
+    IDENTIFIER = re.compile(r'[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*')
+    COMMENT = re.compile(r'//.*$|/\*.*?\*/', re.DOTALL)
+    STRING = re.compile(r'"(?:[^"\\]|\\.)*"')
+    PREFIX = re.compile(r'(?:(?:parameter|constant|input|output|discrete|flow|stream|final|inner|outer|'
+                        r'replaceable|redeclare|each)\s+)*')
+    TYPE = re.compile(r'([A-Za-z_][\w.]*)\s*(?:\[[^\]]*\])?\s+')
+    NOT_DECLARATIONS = {'import', 'extends', 'annotation', 'type', 'record', 'function', 'connector',
+                        'block', 'model', 'package', 'class', 'public', 'protected'}
+
+    def __init__(self, keep: Iterable[str] = ()):
+        self.keep = set(keep)  # Names that are never dropped
+
+    def prune(self, modes: Dict[str, ModeDefinition]) -> Dict[str, int]:
+        """Removes unreachable declarations from each mode's view and returns the dropped line count per mode"""
+        return {name: self._prune_mode(mode) for name, mode in modes.items()}
+
+    def _prune_mode(self, mode: ModeDefinition) -> int:
+        table = mode.table
+        masks = table.masks["declarations"]
+        statements = self._statements(mode)
+
+        # Symbol graph: declared name -> statements declaring it, statement -> names it references
+        declares: Dict[str, List[int]] = {}
+        for i, (_, names, _) in enumerate(statements):
+            for name in names:
+                declares.setdefault(name, []).append(i)
+
+        roots = set(self.keep)
+        for section in ("equations", "initial_equations", "algorithms", "initial_algorithms"):
+            for line in getattr(mode, section):
+                roots |= self._references(line)
+
+        reachable: Set[int] = set()
+        pending = [name for name in roots if name in declares]
+        while pending:
+            for i in declares.pop(pending.pop(), ()):
+                if i not in reachable:
+                    reachable.add(i)
+                    pending.extend(n for n in statements[i][2] if n in declares)
+
+        dropped = 0
+        for i, (indices, names, _) in enumerate(statements):
+            if names and i not in reachable:
+                for index in indices:
+                    masks[index] &= ~mode.bit
+                dropped += len(indices)
+        return dropped
+
+    def _statements(self, mode: ModeDefinition) -> List[Tuple[List[int], Set[str], Set[str]]]:
+        """Groups the mode's declaration lines into statements: (table indices, declared names, referenced names)"""
+        table = mode.table
+        statements = []
+        indices: List[int] = []
+        text = ""
+        for index, (line, mask) in enumerate(zip(table.lines["declarations"], table.masks["declarations"])):
+            if not mask & mode.bit:
+                continue
+            indices.append(index)
+            text += line + "\n"
+            code = self._code(text).strip()
+            if not code or code.endswith(";"):
+                declared = self._declared(code)
+                statements.append((indices, declared, self._references(code) - declared))
+                indices, text = [], ""
+        if indices:
+            statements.append((indices, set(), set()))  # Unterminated trailing lines are kept
+        return statements
+
+    def _code(self, text: str) -> str:
+        """Text without comments and string literals"""
+        return self.COMMENT.sub(" ", self.STRING.sub('""', text))
+
+    def _references(self, text: str) -> Set[str]:
+        """First components of all identifiers in a line, e.g. 'mass' for 'mass.flange_a'"""
+        return {match.group().split(".", 1)[0] for match in self.IDENTIFIER.finditer(self._code(text))}
+
+    def _declared(self, code: str) -> Set[str]:
+        """Names declared by a component statement; empty for imports, extends and anything else"""
+        rest = code[self.PREFIX.match(code).end():]
+        type_match = self.TYPE.match(rest)
+        if not type_match or type_match.group(1) in self.NOT_DECLARATIONS:
+            return set()
+        rest = rest[type_match.end():]
+
+        # Names are the leading identifiers of the top-level comma-separated parts
+        names, depth, part = set(), 0, ""
+        for char in rest:
+            if char in "([{":
+                depth += 1
+            elif char in ")]}":
+                depth -= 1
+            if depth == 0 and char in ",;":
+                self._add_name(part, names)
+                part = ""
+                if char == ";":
+                    break
+            else:
+                part += char
+        return names
+
+    def _add_name(self, part: str, names: Set[str]):
+        part = part.strip()
+        match = re.match(r'[A-Za-z_]\w*', part)
+        if match and not part.startswith("annotation"):
+            names.add(match.group())
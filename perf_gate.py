@@ -0,0 +1,260 @@
+"""
+Performance regression gate for FMUVSS, ContextModelica and ModeGen.
+
+Runs a fixed set of benchmarks several times each and compares them with a baseline JSON
+written earlier by --save. For every benchmark, the ratio of medians (current / baseline) gets
+a bootstrap confidence interval. A benchmark regresses if the ratio exceeds 1 + threshold and
+the whole interval lies above 1. The exit status is 1 if any benchmark regressed, or if a benchmark
+in the baseline failed or was not run now (e.g. it was removed or renamed).
+
+Usage:
+  python perf_gate.py --save baseline.json                 # record a baseline
+  python perf_gate.py --baseline baseline.json             # run and compare
+  python perf_gate.py --baseline old.json --current new.json   # compare two recorded runs
+Options: [--repeat N] [--threshold 0.10] [--only SUBSTRING ...] [--save FILE]
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from functools import lru_cache
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+
+def _import(name, path):
+    """Imports a script that is not part of a package"""
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[name]  # A failed import must not leave a half-initialized module behind
+            raise
+    return sys.modules[name]
+
+# === Benchmarks ===
+# Each returns one sample in the unit given in BENCHMARKS; lower is better.
+
+_mock_segments = {}  # Mock case -> segment count of its first run, the same for both FMI versions
+
+def _fmuvss_mock(case, fmi_version):
+    bench = _import('bench_examples', ROOT / '01_FMUVSS' / 'Benchmarks' / 'bench_examples.py')
+    engine = bench.load_engine(fmi_version)
+    simulator = engine(bench.case_config(case, fmi_version, 'short'), verbose=False)
+    start = time.perf_counter()
+    simulator.run()
+    elapsed = time.perf_counter() - start
+    segments = _mock_segments.setdefault(case, len(simulator.results))
+    if segments != len(simulator.results):
+        raise RuntimeError(f"{case} ran {len(simulator.results)} segments on FMI {fmi_version}, "
+                           f"{segments} on the other version")
+    return elapsed / sum(len(result['time']) for result in simulator.results) * 1e6
+
+def _stop_condition_view():
+    bench = _import('bench_stop_condition', ROOT / '01_FMUVSS' / 'Benchmarks' / 'bench_stop_condition.py')
+    condition = bench.as_condition('r > L')
+    return bench.bench_view(condition, bench._params(1000), ['r'], 20000) * 1e9
+
+@lru_cache(maxsize=None)
+def _petri_workload(places, steps):
+    bench = _import('bench_petri_net', ROOT / '02_ContextModelica' / 'Benchmarks' / 'bench_petri_net.py')
+    cfg = bench.synthetic_context_cfg(places, seed=0)
+    return cfg, bench.random_walk(cfg['globals'], steps, seed=0)
+
+def _petri_fire(engine, places):
+    bench = _import('bench_petri_net', ROOT / '02_ContextModelica' / 'Benchmarks' / 'bench_petri_net.py')
+    cfg, walk = _petri_workload(places, 300)
+    net = bench.PETRI_NETS[engine](cfg)
+    elapsed = 0.0
+    for values in walk:
+        net.globals.update(values)
+        start = time.perf_counter()
+        net.fire()
+        elapsed += time.perf_counter() - start
+    return elapsed / len(walk) * 1e6
+
+def _context_engine(petri_net):
+    cm = _import('ContextModelica', ROOT / '02_ContextModelica' / 'ContextModelica.py')
+    context = {'places': {'Rising': {'initial': 1}, 'Falling': {'initial': 0}}, 'globals': ['y'],
+               'guards': {'Activate_Rising': 'y <= 0', 'Deactivate_Rising': 'y > 1',
+                          'Activate_Falling': 'y > 1', 'Deactivate_Falling': 'y <= 0'},
+               'relations': {'exclusion': [['Rising', 'Falling']]}}
+    sim = {'initial_time': 0.0, 'stop_time': 10.0, 'step_size': 1e-3,
+           'modes': {'Rising': {'fmu': 'mock:ramp?slope=1', 'outputs': ['y'], 'stop_condition': 'y > 1'},
+                     'Falling': {'fmu': 'mock:ramp', 'parameters': {'slope': -1}, 'outputs': ['y'],
+                                 'stop_condition': 'y <= 0'}}}
+    engine = cm.SimulationEngine(context, sim, {}, verbose=False, petri_net=petri_net)
+    start = time.perf_counter()
+    engine.run(plot=False)
+    elapsed = time.perf_counter() - start
+    if engine.error is not None:
+        raise engine.error
+    return elapsed / len(engine.logs['y']) * 1e6
+
+def _synthetic_sum(modes, lines_per_mode):
+    names = [f'M{i}' for i in range(modes)]
+    text = [f"/*#\nMODEL-METADATA\n  Modes: [{', '.join(names)}]\n#*/", "model Synthetic", "  //# [All]",
+            "  parameter Real k = 1;"]
+    for name in names:
+        text.append(f"  //# [{name}]")
+        text.extend(f"  Real {name.lower()}_x{j};" for j in range(lines_per_mode))
+    text.append("@#equation")
+    for name in names:
+        text.append(f"  //# [{name}]")
+        text.extend(f"  der({name.lower()}_x{j}) = -k * {name.lower()}_x{j};" for j in range(lines_per_mode))
+    text.append("@#end Synthetic;")
+    return "\n".join(text) + "\n"
+
+def _modegen(modes, lines_per_mode):
+    if str(ROOT / '03_ModeGen') not in sys.path:
+        sys.path.insert(0, str(ROOT / '03_ModeGen'))
+    from ModeGen.parser import ModelicaAnnotationParser
+    from ModeGen.generator import ModelicaGenerator
+    with tempfile.TemporaryDirectory(prefix='perf_gate_') as work:
+        path = Path(work) / 'SyntheticSUM.mo'
+        path.write_text(_synthetic_sum(modes, lines_per_mode))
+        start = time.perf_counter()
+        ModelicaGenerator().generate(path, ModelicaAnnotationParser().parse(path))
+        return (time.perf_counter() - start) * 1e3
+
+# name -> (unit, sample function)
+BENCHMARKS = {
+    'fmuvss.mock-Pendulum.fmi2': ('us/step', lambda: _fmuvss_mock('mock-Pendulum', '2.0')),
+    'fmuvss.mock-Pendulum.fmi3': ('us/step', lambda: _fmuvss_mock('mock-Pendulum', '3.0')),
+    'fmuvss.mock-Switching.fmi2': ('us/step', lambda: _fmuvss_mock('mock-Switching', '2.0')),
+    'fmuvss.mock-Switching.fmi3': ('us/step', lambda: _fmuvss_mock('mock-Switching', '3.0')),
+    'fmuvss.stop-condition.1000-params': ('ns/step', _stop_condition_view),
+    'contextmodelica.fire.snakes.50': ('us/fire', lambda: _petri_fire('snakes', 50)),
+    'contextmodelica.fire.compiled.50': ('us/fire', lambda: _petri_fire('compiled', 50)),
+    'contextmodelica.engine.snakes': ('us/step', lambda: _context_engine('snakes')),
+    'contextmodelica.engine.compiled': ('us/step', lambda: _context_engine('compiled')),
+    'modegen.parse-generate.20x200': ('ms', lambda: _modegen(20, 200)),
+}
+
+def run(names, repeat):
+    """
+    Samples every benchmark `repeat` times after one warm-up call; failures are recorded as errors.
+    Whatever the benchmarked code prints is discarded.
+    """
+    results = {}
+    for name in names:
+        unit, sample = BENCHMARKS[name]
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                sample()
+                results[name] = {'unit': unit, 'samples': [sample() for _ in range(repeat)]}
+        except Exception as e:
+            results[name] = {'unit': unit, 'error': f"{type(e).__name__}: {e}"}
+        print(f"  {name}: {_describe(results[name])}", file=sys.stderr)
+    return results
+
+def _describe(result):
+    if 'error' in result:
+        return result['error']
+    return f"median {statistics.median(result['samples']):.3f} {result['unit']}"
+
+# === Statistics ===
+def bootstrap_ratio(baseline, current, resamples=2000, confidence=0.95, seed=0):
+    """Ratio of medians (current / baseline) with a percentile bootstrap confidence interval"""
+    rng = random.Random(seed)
+    ratios = sorted(
+        statistics.median(rng.choices(current, k=len(current))) /
+        statistics.median(rng.choices(baseline, k=len(baseline)))
+        for _ in range(resamples))
+    tail = (1 - confidence) / 2
+    low = ratios[int(tail * (resamples - 1))]
+    high = ratios[int((1 - tail) * (resamples - 1))]
+    return statistics.median(current) / statistics.median(baseline), low, high
+
+def compare(baseline, current, threshold):
+    """Rows of (name, unit, baseline median, current median, ratio, low, high, verdict)"""
+    rows = []
+    for name in sorted(set(baseline) | set(current)):
+        base, cur = baseline.get(name), current.get(name)
+        if base is None or 'samples' not in base:
+            rows.append((name, (cur or {}).get('unit', ''), None, None, None, None, None, 'new'))
+            continue
+        if cur is None:
+            rows.append((name, base['unit'], statistics.median(base['samples']), None, None, None, None, 'not run'))
+            continue
+        if 'samples' not in cur:
+            rows.append((name, base['unit'], statistics.median(base['samples']), None, None, None, None, 'error'))
+            continue
+        ratio, low, high = bootstrap_ratio(base['samples'], cur['samples'])
+        if ratio > 1 + threshold and low > 1:
+            verdict = 'REGRESSION'
+        elif ratio < 1 - threshold and high < 1:
+            verdict = 'improved'
+        else:
+            verdict = 'ok'
+        rows.append((name, base['unit'], statistics.median(base['samples']), statistics.median(cur['samples']),
+                     ratio, low, high, verdict))
+    return rows
+
+def _fmt(value, spec):
+    return '-' if value is None else format(value, spec)
+
+def print_table(rows):
+    print(f"{'benchmark':<38}{'unit':>9}{'baseline':>12}{'current':>12}{'change':>9}{'95% CI':>18}  verdict")
+    for name, unit, base, cur, ratio, low, high, verdict in rows:
+        change = _fmt(None if ratio is None else ratio - 1, '+.1%')
+        ci = '-' if low is None else f"{low - 1:+.1%}..{high - 1:+.1%}"
+        print(f"{name:<38}{unit:>9}{_fmt(base, '.3f'):>12}{_fmt(cur, '.3f'):>12}{change:>9}{ci:>18}  {verdict}")
+
+def _machine():
+    return {'python': platform.python_version(), 'machine': platform.machine(),
+            'processor': platform.processor(), 'system': platform.platform(), 'cpus': os.cpu_count()}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--baseline', help="Baseline JSON to compare against")
+    parser.add_argument('--current', help="Compare this recorded run instead of running the benchmarks")
+    parser.add_argument('--save', help="Write the measurements of this run to a JSON file")
+    parser.add_argument('--repeat', type=int, default=7, help="Samples per benchmark (default: 7)")
+    parser.add_argument('--threshold', type=float, default=0.10, help="Tolerated slowdown (default: 0.10 = 10%%)")
+    parser.add_argument('--only', nargs='+', default=None, help="Run only benchmarks containing one of these strings")
+    args = parser.parse_args(argv)
+    if not (args.baseline or args.save):
+        parser.error("nothing to do: give --baseline and/or --save")
+
+    if args.current:
+        with open(args.current) as f:
+            document = json.load(f)
+    else:
+        names = [n for n in BENCHMARKS if not args.only or any(s in n for s in args.only)]
+        document = {'machine': _machine(), 'repeat': args.repeat, 'benchmarks': run(names, args.repeat)}
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(document, f, indent=2)
+
+    if not args.baseline:
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('machine') != document.get('machine'):
+        print("Warning: the baseline was recorded on a different machine or Python version", file=sys.stderr)
+    benchmarks = baseline['benchmarks']
+    if args.only and not args.current:
+        benchmarks = {n: b for n, b in benchmarks.items() if any(s in n for s in args.only)}
+
+    rows = compare(benchmarks, document['benchmarks'], args.threshold)
+    print_table(rows)
+    failed = [row[0] for row in rows if row[7] in ('REGRESSION', 'error', 'not run')]
+    if failed:
+        print(f"\n{len(failed)} benchmark(s) failed the gate: {', '.join(failed)}")
+        sys.exit(1)
+    print("\nNo regressions")
+
+if __name__ == '__main__':
+    main()